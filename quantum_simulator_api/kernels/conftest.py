@@ -0,0 +1,35 @@
+from math import sqrt
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture(
+    scope="function",
+    params=[
+        [["cos(theta/2)", "-sin(theta/2)"], ["sin(theta/2)", "cos(theta/2)"]],
+        [["exp(-1i*theta/2)", "0"], ["0", "exp(1i*theta/2)"]],
+    ],
+)
+def rotation_template(request):
+    return request.param
+
+
+@pytest.fixture(scope="function")
+def hadamard():
+    return [[sqrt(1 / 2), sqrt(1 / 2)], [sqrt(1 / 2), -sqrt(1 / 2)]]
+
+
+@pytest.fixture(scope="function")
+def bell_state():
+    return np.array([[0.5, 0, 0, 0.5], [0, 0, 0, 0], [0, 0, 0, 0], [0.5, 0, 0, 0.5]])
+
+
+@pytest.fixture(scope="function")
+def bit_flip():
+    return np.array(
+        [
+            [[sqrt(0.7), 0], [0, sqrt(0.7)]],
+            [[0, sqrt(0.3)], [sqrt(0.3), 0]],
+        ]
+    )
@@ -0,0 +1,165 @@
+import re
+from typing import Dict, List
+
+import numpy as np
+
+IMAGINARY_LITERAL = re.compile(r"(?<=[0-9.])i\b")
+TEMPLATE_NAMESPACE = {
+    "__builtins__": {},
+    "i": 1j,
+    "pi": np.pi,
+    "e": np.e,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+}
+
+
+def expand_parameter_grid(grid: Dict[str, List[float]]) -> Dict[str, np.ndarray]:
+    names = list(grid.keys())
+    axes = np.meshgrid(
+        *[np.asarray(grid[name], dtype=float) for name in names], indexing="ij"
+    )
+    return {name: axis.ravel() for name, axis in zip(names, axes)}
+
+
+def evaluate_template(
+    template: List[List[str]], parameters: Dict[str, np.ndarray], batch_size: int
+) -> np.ndarray:
+    dim = len(template)
+    matrices = np.empty((batch_size, dim, dim), dtype=np.complex128)
+    for row_index, row in enumerate(template):
+        for column_index, expression in enumerate(row):
+            expression = IMAGINARY_LITERAL.sub("j", expression.replace(" ", ""))
+            value = eval(expression, TEMPLATE_NAMESPACE, dict(parameters))
+            matrices[:, row_index, column_index] = np.broadcast_to(
+                np.asarray(value, dtype=np.complex128), (batch_size,)
+            )
+    return matrices
+
+
+def is_unitary(matrices: np.ndarray, atol: float = 1e-8) -> bool:
+    identity = np.eye(matrices.shape[-1])
+    products = matrices @ np.conj(np.swapaxes(matrices, -1, -2))
+    return bool(np.allclose(products, identity, atol=atol))
+
+
+def initial_density_matrices(
+    qubit_count: int, batch_size: int, dtype: str = "complex128"
+) -> np.ndarray:
+    dim = 2 ** qubit_count
+    density_matrices = np.zeros((batch_size, dim, dim), dtype=dtype)
+    density_matrices[:, 0, 0] = 1
+    return density_matrices
+
+
+def cast_density_matrix(
+    density_matrices: np.ndarray, dtype: str, tolerance: float = 1e-6
+) -> np.ndarray:
+    density_matrices = np.asarray(density_matrices, dtype=dtype)
+    traces = np.trace(density_matrices, axis1=-2, axis2=-1)
+    if np.any(np.abs(traces - 1) > tolerance):
+        density_matrices = density_matrices / traces[..., np.newaxis, np.newaxis]
+    return density_matrices
+
+
+def apply_unitaries(density_matrices: np.ndarray, unitaries: np.ndarray) -> np.ndarray:
+    return unitaries @ density_matrices @ np.conj(np.swapaxes(unitaries, -1, -2))
+
+
+def probabilities(density_matrices: np.ndarray) -> np.ndarray:
+    return np.real(np.diagonal(density_matrices, axis1=-2, axis2=-1))
+
+
+def expectations(density_matrices: np.ndarray, observable: np.ndarray) -> np.ndarray:
+    return np.real(np.einsum("...ij,ji->...", density_matrices, observable))
+
+
+def marginal_probabilities(diagonal: np.ndarray, qubits: List[int]) -> np.ndarray:
+    qubit_count = count_qubits(diagonal)
+    tensor = np.real(diagonal).reshape((2,) * qubit_count)
+    traced = tuple(qubit for qubit in range(qubit_count) if qubit not in qubits)
+    marginal = tensor.sum(axis=traced)
+    kept = sorted(qubits)
+    return marginal.transpose([kept.index(qubit) for qubit in qubits]).ravel()
+
+
+def partial_trace(density_matrix: np.ndarray, keep: List[int]) -> np.ndarray:
+    qubit_count = count_qubits(density_matrix)
+    traced = [qubit for qubit in range(qubit_count) if qubit not in keep]
+    axes = list(keep) + traced
+    tensor = density_matrix.reshape((2,) * 2 * qubit_count).transpose(
+        axes + [axis + qubit_count for axis in axes]
+    )
+    kept_dim = 2 ** len(keep)
+    traced_dim = 2 ** len(traced)
+    tensor = tensor.reshape(kept_dim, traced_dim, kept_dim, traced_dim)
+    return np.einsum("ajbj->ab", tensor)
+
+
+def count_qubits(density_matrix: np.ndarray) -> int:
+    return density_matrix.shape[-1].bit_length() - 1
+
+
+def is_complete(operators: np.ndarray, atol: float = 1e-8) -> bool:
+    completeness = np.einsum("kji,kjl->il", np.conj(operators), operators)
+    return bool(np.allclose(completeness, np.eye(operators.shape[-1]), atol=atol))
+
+
+def apply_kraus(density_matrices: np.ndarray, operators: np.ndarray) -> np.ndarray:
+    # batched matmuls cost O(k d^3). a single three operand einsum loops over
+    # every index at once and costs O(k d^4)
+    branches = (
+        operators
+        @ density_matrices[..., np.newaxis, :, :]
+        @ np.conj(np.swapaxes(operators, -1, -2))
+    )
+    return np.sum(branches, axis=-3)
+
+
+def initial_state_vectors(
+    qubit_count: int, batch_size: int, trajectory_count: int, dtype: str = "complex128"
+) -> np.ndarray:
+    state_vectors = np.zeros(
+        (batch_size, trajectory_count, 2 ** qubit_count), dtype=dtype
+    )
+    state_vectors[..., 0] = 1
+    return state_vectors
+
+
+def apply_unitaries_to_vectors(
+    state_vectors: np.ndarray, unitaries: np.ndarray
+) -> np.ndarray:
+    return np.einsum("...ij,...tj->...ti", unitaries, state_vectors)
+
+
+def sample_kraus(
+    state_vectors: np.ndarray, operators: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    # branch k of trajectory t occurs with probability ||K_k psi_t||^2
+    branches = np.einsum("kij,...j->...ki", operators, state_vectors)
+    weights = np.sum(np.abs(branches) ** 2, axis=-1)
+    thresholds = rng.random(weights.shape[:-1] + (1,)) * weights.sum(axis=-1)[..., None]
+    choices = np.minimum(
+        (np.cumsum(weights, axis=-1) < thresholds).sum(axis=-1), len(operators) - 1
+    )
+    selected = np.take_along_axis(branches, choices[..., None, None], axis=-2)[
+        ..., 0, :
+    ]
+    norms = np.sqrt(np.take_along_axis(weights, choices[..., None], axis=-1))
+    return (selected / norms).astype(state_vectors.dtype)
+
+
+def trajectory_probabilities(state_vectors: np.ndarray) -> np.ndarray:
+    return np.mean(np.abs(state_vectors) ** 2, axis=-2)
+
+
+def trajectory_expectations(
+    state_vectors: np.ndarray, observable: np.ndarray
+) -> np.ndarray:
+    values = np.einsum(
+        "...ti,ij,...tj->...t", np.conj(state_vectors), observable, state_vectors
+    )
+    return np.mean(np.real(values), axis=-1)
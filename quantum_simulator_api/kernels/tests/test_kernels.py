@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+from ..kernels import (
+    apply_kraus,
+    apply_unitaries,
+    apply_unitaries_to_vectors,
+    cast_density_matrix,
+    evaluate_template,
+    expand_parameter_grid,
+    expectations,
+    initial_density_matrices,
+    initial_state_vectors,
+    is_complete,
+    is_unitary,
+    marginal_probabilities,
+    partial_trace,
+    probabilities,
+    sample_kraus,
+    trajectory_expectations,
+    trajectory_probabilities,
+)
+
+
+def test_expand_parameter_grid():
+    grid = expand_parameter_grid({"a": [0, 1], "b": [2, 3, 4]})
+    assert grid["a"].tolist() == [0, 0, 0, 1, 1, 1]
+    assert grid["b"].tolist() == [2, 3, 4, 2, 3, 4]
+
+
+def test_evaluate_template(rotation_template):
+    thetas = np.linspace(0, np.pi, 5)
+    matrices = evaluate_template(rotation_template, {"theta": thetas}, len(thetas))
+    assert matrices.shape == (5, 2, 2)
+    assert is_unitary(matrices)
+
+
+def test_apply_unitaries(hadamard):
+    density_matrices = initial_density_matrices(1, 3)
+    density_matrices = apply_unitaries(density_matrices, np.array(hadamard))
+    assert np.allclose(probabilities(density_matrices), 0.5)
+
+    pauli_z = np.array([[1, 0], [0, -1]])
+    assert np.allclose(expectations(density_matrices, pauli_z), 0)
+
+
+def test_cast_density_matrix():
+    drifted = np.array([[0.5 + 1e-4, 0], [0, 0.5]])
+    density_matrix = cast_density_matrix(drifted, "complex64")
+    assert density_matrix.dtype == np.complex64
+    assert abs(np.trace(density_matrix) - 1) < 1e-6
+
+
+def test_marginal_probabilities(bell_state):
+    product = np.kron([0.25, 0.75], [1, 0])
+    assert np.allclose(marginal_probabilities(product, [0]), [0.25, 0.75])
+    assert np.allclose(marginal_probabilities(product, [1]), [1, 0])
+    assert np.allclose(marginal_probabilities(product, [1, 0]), [0.25, 0.75, 0, 0])
+    bell_diagonal = probabilities(bell_state)
+    assert np.allclose(marginal_probabilities(bell_diagonal, [1]), [0.5, 0.5])
+
+
+def test_partial_trace(bell_state):
+    product = np.kron(np.diag([0.25, 0.75]), np.diag([1, 0]))
+    assert np.allclose(partial_trace(product, [0]), np.diag([0.25, 0.75]))
+    assert np.allclose(partial_trace(product, [1]), np.diag([1, 0]))
+    assert np.allclose(
+        partial_trace(product, [1, 0]), np.kron(np.diag([1, 0]), np.diag([0.25, 0.75]))
+    )
+    assert np.allclose(partial_trace(bell_state, [0]), np.eye(2) / 2)
+
+
+def test_is_complete(bit_flip):
+    assert is_complete(bit_flip)
+    assert not is_complete(bit_flip[:1])
+
+
+def test_apply_kraus(bit_flip):
+    density_matrices = apply_kraus(initial_density_matrices(1, 2), bit_flip)
+    assert np.allclose(probabilities(density_matrices), [0.7, 0.3])
+
+
+def test_apply_kraus_on_many_qubits(bit_flip):
+    # bit flip on the first of 7 qubits. quartic cost took seconds here
+    operators = np.array([np.kron(operator, np.eye(2 ** 6)) for operator in bit_flip])
+    density_matrices = initial_density_matrices(7, 2)
+    start = time.perf_counter()
+    density_matrices = apply_kraus(density_matrices, operators)
+    assert time.perf_counter() - start < 1
+    expected = np.zeros(2 ** 7)
+    expected[0], expected[2 ** 6] = 0.7, 0.3
+    assert np.allclose(probabilities(density_matrices), expected)
+
+
+def test_sample_kraus(bit_flip):
+    rng = np.random.default_rng(0)
+    state_vectors = initial_state_vectors(1, 2, 4000)
+    state_vectors = sample_kraus(state_vectors, bit_flip, rng)
+    assert np.allclose(np.linalg.norm(state_vectors, axis=-1), 1)
+    assert np.allclose(trajectory_probabilities(state_vectors), [0.7, 0.3], atol=0.05)
+
+    pauli_z = np.array([[1, 0], [0, -1]])
+    expectations = trajectory_expectations(state_vectors, pauli_z)
+    assert np.allclose(expectations, 0.4, atol=0.1)
+
+
+def test_apply_unitaries_to_vectors(hadamard):
+    state_vectors = initial_state_vectors(1, 3, 2)
+    state_vectors = apply_unitaries_to_vectors(state_vectors, np.array(hadamard))
+    assert np.allclose(trajectory_probabilities(state_vectors), 0.5)
@@ -1,17 +1,20 @@
+import asyncio
+import json
 import logging
 import os
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 import quantum_simulator.channel.channel as qc
 import quantum_simulator.channel.registers as qr
 import quantum_simulator.channel.state as qs
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_contrib.db.models import MongoDBModel
-from fastapi_contrib.db.utils import setup_mongodb
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi_contrib.common.utils import get_now
+from fastapi_contrib.db.utils import get_db_client, setup_mongodb
 from fastapi_contrib.serializers import openapi
 from fastapi_contrib.serializers.common import ModelSerializer
-from pydantic import Field
 from quantum_simulator.base.observable import Observable
 from quantum_simulator.base.qubits import Qubits
 from quantum_simulator.base.time_evolution import TimeEvolution
@@ -19,10 +22,23 @@ from quantum_simulator.channel.transformer import (
     ObserveTransformer,
     TimeEvolveTransformer,
 )
-
-from .models.models import State, Transformer, TransformerType
-from .routers import helpers, state, transformer
+from starlette.websockets import WebSocketState
+
+from .kernels.kernels import apply_kraus, cast_density_matrix
+from .middlewares.middlewares import ProfilerMiddleware
+from .models.models import (
+    Channel,
+    Precision,
+    Profile,
+    State,
+    Transformer,
+    TransformerType,
+)
+from .routers import export, helpers, profile, state, sweep, transformer
+from .routers.transformer import load_operators
 from .utils.utils import (
+    parse_diagonal,
+    parse_matrix,
     remove_spaces,
     translate_imaginary_string,
     translate_imaginary_symbol,
@@ -31,8 +47,11 @@ from .utils.utils import (
 logger = logging.getLogger("uvicorn")
 
 app = FastAPI()
+app.include_router(export.router)
 app.include_router(helpers.router)
+app.include_router(profile.router)
 app.include_router(state.router)
+app.include_router(sweep.router)
 app.include_router(transformer.router)
 
 # cors settings
@@ -42,31 +61,144 @@ app.add_middleware(
     allow_methods=os.environ.get("ALLOW_METHODS", "*").split(","),
 )
 
+# compression settings
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=int(os.environ.get("GZIP_MINIMUM_SIZE", "1000")),
+)
 
-# models
-class Channel(MongoDBModel):
-    name: str = ""
-    qubit_count: int = Field(1, ge=1, le=8)
-    register_count: int = Field(1, ge=1, le=8)
-    init_transformer_ids: List[int] = []
-    state_ids: List[int] = []
-    transformer_ids: List[int] = []
-    outcome: Optional[int] = None
-
-    class Meta:
-        collection = "channel"
+# retention settings. channels are kept forever when ttl is 0
+CHANNEL_FINALIZED_TTL_SECONDS = int(
+    os.environ.get("CHANNEL_FINALIZED_TTL_SECONDS", "0")
+)
+CHANNEL_IDLE_TTL_SECONDS = int(os.environ.get("CHANNEL_IDLE_TTL_SECONDS", "0"))
+RETENTION_INTERVAL_SECONDS = int(os.environ.get("RETENTION_INTERVAL_SECONDS", "3600"))
+
+# websocket settings. number of states waiting to be saved per connection
+WEBSOCKET_QUEUE_SIZE = int(os.environ.get("WEBSOCKET_QUEUE_SIZE", "16"))
+
+# profiling settings. the middleware is only mounted when enabled
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+if PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0:
+    app.add_middleware(
+        ProfilerMiddleware, token=PROFILE_TOKEN, sample_rate=PROFILE_SAMPLE_RATE
+    )
 
 
+# serializers
 @openapi.patch
 class ChannelSerializer(ModelSerializer):
     id: int
     state_ids: List[int]
     transformer_ids: List[int]
     outcome: Optional[int]
+    parent_id: Optional[int]
+    created: datetime
+    last_used: datetime
 
     class Meta:
         model = Channel
-        read_only_fields = {"id", "state_ids", "transformer_ids", "outcome"}
+        read_only_fields = {
+            "id",
+            "state_ids",
+            "transformer_ids",
+            "outcome",
+            "parent_id",
+            "created",
+            "last_used",
+        }
+
+
+# helpers
+def serialize_qubits(matrix, precision: Precision) -> List[List[str]]:
+    # renormalizes trace drift of reduced precision states on every save
+    matrix = cast_density_matrix(matrix, precision.value)
+    return translate_imaginary_symbol(matrix.astype(str).tolist())
+
+
+async def remove_channel(channel: Channel) -> None:
+    for state_id in channel.state_ids:
+        # keep states which are still referenced by forked channels
+        if await Channel.count(state_ids=state_id) > 1:
+            continue
+        await State.delete(id=state_id)
+
+    await Channel.delete(id=channel.id)
+
+
+async def backfill_last_used() -> None:
+    # channels saved before last_used existed are idle since their creation
+    collection = get_db_client().get_collection(Channel.get_db_collection())
+    await collection.update_many(
+        {"last_used": {"$exists": False}}, [{"$set": {"last_used": "$created"}}]
+    )
+
+
+async def expire_channels() -> int:
+    now = get_now()
+    conditions = []
+    if CHANNEL_FINALIZED_TTL_SECONDS > 0:
+        expired_at = now - timedelta(seconds=CHANNEL_FINALIZED_TTL_SECONDS)
+        conditions.append({"outcome": {"$ne": None}, "last_used": {"$lt": expired_at}})
+    if CHANNEL_IDLE_TTL_SECONDS > 0:
+        expired_at = now - timedelta(seconds=CHANNEL_IDLE_TTL_SECONDS)
+        conditions.append({"last_used": {"$lt": expired_at}})
+    if not conditions:
+        return 0
+
+    expired_count = 0
+    for channel in await Channel.list(raw=False, **{"$or": conditions}):
+        await remove_channel(channel)
+        expired_count += 1
+    return expired_count
+
+
+async def expire_channels_periodically() -> None:
+    while True:
+        try:
+            expired_count = await expire_channels()
+            if expired_count > 0:
+                logger.info(f"expired {expired_count} channels")
+        except Exception as e:
+            logger.exception(e)
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+def lookup(model, local_field: str, field: str, projection: dict) -> List[dict]:
+    # join on the _id index, then keep only the projected fields of each
+    # joined document. the joined document is bound to $$document
+    return [
+        {
+            "$lookup": {
+                "from": model.get_db_collection(),
+                "localField": local_field,
+                "foreignField": "_id",
+                "as": field,
+            }
+        },
+        {
+            "$addFields": {
+                field: {
+                    "$map": {"input": f"${field}", "as": "document", "in": projection}
+                }
+            }
+        },
+    ]
+
+
+def project_fields(*fields: str) -> dict:
+    return {field: f"$$document.{field}" for field in fields}
+
+
+def unchanged_channel(channel_id: int, state_ids: List[int]) -> dict:
+    # filter matching the channel only while no state was appended since read
+    return {"id": channel_id, "state_ids": state_ids, "outcome": None}
+
+
+def rename_id(document: dict) -> dict:
+    document["id"] = document.pop("_id")
+    return document
 
 
 # setup
@@ -74,6 +206,28 @@ class ChannelSerializer(ModelSerializer):
 async def startup():
     setup_mongodb(app)
 
+    for model in (Channel, State, Transformer, Profile):
+        try:
+            await model.create_indexes()
+        except Exception as e:
+            logger.exception(e)
+
+    if RETENTION_INTERVAL_SECONDS > 0 and (
+        CHANNEL_FINALIZED_TTL_SECONDS > 0 or CHANNEL_IDLE_TTL_SECONDS > 0
+    ):
+        try:
+            await backfill_last_used()
+        except Exception as e:
+            logger.exception(e)
+        app.state.retention_task = asyncio.create_task(expire_channels_periodically())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    retention_task = getattr(app.state, "retention_task", None)
+    if retention_task is not None:
+        retention_task.cancel()
+
 
 # channel api
 @app.get("/channel/", response_model=Dict[str, List[Dict]])
@@ -91,10 +245,96 @@ async def list_channel():
 
 
 @app.get("/channel/{id}", response_model=dict)
-async def get_channel(id: int):
-    channel = await Channel.get(id=id)
-    if not channel:
+async def get_channel(
+    id: int,
+    expand: Optional[str] = None,
+    state_limit: int = Query(10, ge=1, le=100),
+    include_qubits: bool = False,
+):
+    if not expand:
+        channel = await Channel.get(id=id)
+        if not channel:
+            raise HTTPException(status_code=404, detail="not found")
+        return channel
+
+    expansions = set(expand.split(","))
+    if not expansions <= {"states", "transformers"}:
+        raise HTTPException(
+            status_code=400, detail="expand accepts only states and transformers"
+        )
+
+    # embed summaries with one aggregation instead of a request per document
+    pipeline: List[dict] = [
+        {"$match": {"_id": id}},
+        {
+            "$addFields": {
+                "expanded_transformer_ids": {
+                    "$setUnion": ["$init_transformer_ids", "$transformer_ids"]
+                },
+                "expanded_state_ids": {"$slice": ["$state_ids", -state_limit]},
+            }
+        },
+    ]
+    if "transformers" in expansions:
+        pipeline += lookup(
+            Transformer,
+            "expanded_transformer_ids",
+            "transformers",
+            project_fields("_id", "name", "type", "target_qubit_count"),
+        )
+    if "states" in expansions:
+        # only the diagonal of each density matrix leaves the database
+        # unless the full matrix is requested
+        projection = project_fields("_id", "registers", "precision", "created")
+        projection["diagonal"] = {
+            "$map": {
+                "input": {"$range": [0, {"$size": "$$document.qubits"}]},
+                "as": "index",
+                "in": {
+                    "$arrayElemAt": [
+                        {"$arrayElemAt": ["$$document.qubits", "$$index"]},
+                        "$$index",
+                    ]
+                },
+            }
+        }
+        if include_qubits:
+            projection["qubits"] = "$$document.qubits"
+        pipeline += lookup(State, "expanded_state_ids", "states", projection)
+    pipeline.append(
+        {"$project": {"expanded_transformer_ids": 0, "expanded_state_ids": 0}}
+    )
+    collection = get_db_client().get_collection(Channel.get_db_collection())
+    documents = await collection.aggregate(pipeline).to_list(length=1)
+    if not documents:
         raise HTTPException(status_code=404, detail="not found")
+
+    channel = rename_id(documents[0])
+    if "transformers" in expansions:
+        transformers = {
+            transformer["_id"]: rename_id(transformer)
+            for transformer in channel.pop("transformers")
+        }
+        channel["init_transformers"] = [
+            transformers[transformer_id]
+            for transformer_id in channel["init_transformer_ids"]
+            if transformer_id in transformers
+        ]
+        channel["transformers"] = [
+            transformers[transformer_id]
+            for transformer_id in channel["transformer_ids"]
+            if transformer_id in transformers
+        ]
+    if "states" in expansions:
+        states = {state["_id"]: rename_id(state) for state in channel.pop("states")}
+        channel["states"] = []
+        for state_id in channel["state_ids"][-state_limit:]:
+            if state_id not in states:
+                continue
+            state = states[state_id]
+            diagonal = parse_matrix([state.pop("diagonal")])[0]
+            state["probabilities"] = [value.real for value in diagonal]
+            channel["states"].append(state)
     return channel
 
 
@@ -110,13 +350,48 @@ async def delete_channel(id: int):
     if not channel:
         raise HTTPException(status_code=404, detail="not found")
 
-    for state_id in channel.state_ids:
-        await State.delete(id=state_id)
-
-    await Channel.delete(id=id)
+    await remove_channel(channel)
     return {"message": "deleted"}
 
 
+@app.post("/channel/{id}/fork", response_model=Dict[str, str])
+async def fork_channel(id: int, at_state: Optional[int] = None):
+    channel = await Channel.get(id=id)
+    if not channel:
+        message = f"channel with id '{id}' is not found"
+        logger.exception(message)
+        raise HTTPException(status_code=404, detail=message)
+
+    if len(channel.state_ids) == 0:
+        message = f"channel with id '{id}' is not initialized"
+        logger.exception(message)
+        raise HTTPException(status_code=400, detail=message)
+
+    if at_state is None:
+        at_state = channel.state_ids[-1]
+    if at_state not in channel.state_ids:
+        message = f"state with id '{at_state}' is not recorded in channel '{id}'"
+        logger.exception(message)
+        raise HTTPException(status_code=400, detail=message)
+
+    # share history up to the state. states are never updated after saved,
+    # so new states are only created when the fork is transformed.
+    index = channel.state_ids.index(at_state)
+    forked_channel = Channel(
+        name=channel.name,
+        qubit_count=channel.qubit_count,
+        register_count=channel.register_count,
+        init_transformer_ids=channel.init_transformer_ids,
+        state_ids=channel.state_ids[: index + 1],
+        transformer_ids=channel.transformer_ids[:index],
+        outcome=channel.outcome if index > len(channel.transformer_ids) else None,
+        parent_id=channel.id,
+        precision=channel.precision,
+    )
+    forked_channel_id = await forked_channel.save()
+    return {"message": "forked", "id": forked_channel_id}
+
+
 @app.put("/channel/{id}/initialize", response_model=Dict[str, str])
 async def initialize_state_of_channel(id: int):
     channel = await Channel.get(id=id)
@@ -147,6 +422,8 @@ async def initialize_state_of_channel(id: int):
                 qc_transformer = ObserveTransformer(Observable(evaled_matrix))
             elif transformer.type == TransformerType.TIMEEVOLVE:
                 qc_transformer = TimeEvolveTransformer(TimeEvolution(evaled_matrix))
+            elif transformer.type == TransformerType.KRAUS:
+                raise ValueError("kraus transformer cannot initialize channel")
         except Exception as e:
             logger.exception(e)
             raise HTTPException(
@@ -165,17 +442,18 @@ async def initialize_state_of_channel(id: int):
         logger.exception(e)
         raise HTTPException(status_code=400, detail="cannot initialize channel")
 
-    qubits = translate_imaginary_symbol(
-        qc_channel.states[0].qubits.matrix.astype(str).tolist()
-    )
+    qubits = serialize_qubits(qc_channel.states[0].qubits.matrix, channel.precision)
     registers = qc_channel.states[0].registers.values
-    state_id = await State(qubits=qubits, registers=registers).save()
+    state_id = await State(
+        qubits=qubits, registers=registers, precision=channel.precision
+    ).save()
     try:
         await Channel.update_one(
             filter_kwargs={"id": channel.id},
             **{
                 "$set": {
                     "state_ids": [state_id],
+                    "last_used": get_now(),
                 }
             },
         )
@@ -198,84 +476,35 @@ async def apply_transformer_to_channel(
         logger.exception(message)
         raise HTTPException(status_code=404, detail=message)
 
-    qc_channel = qc.Channel(
-        qubit_count=channel.qubit_count,
-        register_count=channel.register_count,
-        init_transformers=[],
-    )
-
     # check whether channel is finalized
     if channel.outcome is not None:
         message = f"channel with id '{id}' is already finalized"
         logger.exception(message)
         raise HTTPException(status_code=400, detail=message)
 
-    # get transformer. then set transformer to channel
-    transformer = await Transformer.get(id=transformer_id)
-    if not transformer:
-        message = f"transformer with id '{transformer_id}' is not found"
-        logger.exception(message)
-        raise HTTPException(
-            status_code=404,
-            detail=message,
-        )
-
-    sanitized_matrix = translate_imaginary_string(remove_spaces(transformer.matrix))
-    evaled_matrix = [
-        list(map(lambda s: complex(eval(s)), row)) for row in sanitized_matrix
-    ]
-    try:
-        if transformer.type == TransformerType.OBSERVE:
-            qc_transformer = ObserveTransformer(Observable(evaled_matrix))
-        elif transformer.type == TransformerType.TIMEEVOLVE:
-            qc_transformer = TimeEvolveTransformer(TimeEvolution(evaled_matrix))
-    except Exception as e:
-        logger.exception(e)
-        raise HTTPException(
-            status_code=400, detail="cannot convert matrix to transformer"
-        )
+    # get transformer and previous state. then transform!!
+    transformer_type, qc_transformer = await load_channel_transformer(
+        channel, transformer_id
+    )
     channel.transformer_ids.append(transformer_id)
-
-    # get previous state. then set the state to channel
-    try:
-        pre_state = await State.get(id=channel.state_ids[-1])
-    except Exception as e:
-        logger.exception(e)
-        raise HTTPException(
-            status_code=400,
-            detail="this channel is not initialized",
-        )
-    qc_registers = qr.Registers(len(pre_state.registers))
-    for index, value in enumerate(pre_state.registers):
-        qc_registers.put(index, value)
-
-    qc_qubits = Qubits(
-        [
-            list(map(complex, row))
-            for row in translate_imaginary_string(pre_state.qubits)
-        ]
+    pre_state = await load_last_state(channel)
+    post_state = transform_state(
+        channel, pre_state, transformer_type, qc_transformer, register_index
     )
-    qc_state = qs.State(qc_qubits, qc_registers)
-    qc_channel.states = [qc_state]
-
-    # transform!!
-    qc_channel.transform(qc_transformer, register_index)
 
     # append post state to channel
-    post_qubits = translate_imaginary_symbol(
-        qc_channel.states[-1].qubits.matrix.astype(str).tolist()
-    )
-    post_registers = qc_channel.states[-1].registers.values
-    post_state_id = await State(qubits=post_qubits, registers=post_registers).save()
+    pre_state_ids = list(channel.state_ids)
+    post_state_id = await post_state.save()
     channel.state_ids.append(post_state_id)
 
     try:
-        await Channel.update_one(
-            filter_kwargs={"id": channel.id},
+        result = await Channel.update_one(
+            filter_kwargs=unchanged_channel(channel.id, pre_state_ids),
             **{
                 "$set": {
                     "transformer_ids": channel.transformer_ids,
                     "state_ids": channel.state_ids,
+                    "last_used": get_now(),
                 }
             },
         )
@@ -283,6 +512,11 @@ async def apply_transformer_to_channel(
         await State.delete(id=post_state_id)
         logger.exception(e)
         raise HTTPException(status_code=500, detail="failed to update channel")
+    if result.matched_count == 0:
+        await State.delete(id=post_state_id)
+        message = f"channel with id '{id}' is changed by another request"
+        logger.exception(message)
+        raise HTTPException(status_code=409, detail=message)
 
     return {
         "message": "transformed",
@@ -298,11 +532,6 @@ async def finalize_channel(id: int, output_indices: List[int]):
         message = f"channel with id '{id}' is not found"
         logger.exception(message)
         raise HTTPException(status_code=404, detail=message)
-    qc_channel = qc.Channel(
-        qubit_count=channel.qubit_count,
-        register_count=channel.register_count,
-        init_transformers=[],
-    )
 
     # check whether channel is finalized
     if channel.outcome is not None:
@@ -310,52 +539,320 @@ async def finalize_channel(id: int, output_indices: List[int]):
         logger.exception(message)
         raise HTTPException(status_code=400, detail=message)
 
-    # get previous state. then set the state to channel
-    try:
-        pre_state = await State.get(id=channel.state_ids[-1])
-    except Exception as e:
-        logger.exception(e)
-        raise HTTPException(
-            status_code=400,
-            detail="this channel is not initialized",
-        )
-    qc_registers = qr.Registers(len(pre_state.registers))
-    for index, value in enumerate(pre_state.registers):
-        qc_registers.put(index, value)
-
-    qc_qubits = Qubits(
-        [
-            list(map(complex, row))
-            for row in translate_imaginary_string(pre_state.qubits)
-        ]
-    )
-    qc_state = qs.State(qc_qubits, qc_registers)
-    qc_channel.states = [qc_state]
-
-    # finalize!!
-    qc_channel.finalize(output_indices)
+    # get previous state. then finalize!!
+    pre_state = await load_last_state(channel)
+    post_state, outcome = finalize_state(channel, pre_state, output_indices)
 
     # append post state and outcome to channel
-    post_qubits = translate_imaginary_symbol(
-        qc_channel.states[-1].qubits.matrix.astype(str).tolist()
-    )
-    post_registers = qc_channel.states[-1].registers.values
-    post_state_id = await State(qubits=post_qubits, registers=post_registers).save()
+    pre_state_ids = list(channel.state_ids)
+    post_state_id = await post_state.save()
     channel.state_ids.append(post_state_id)
-    channel.outcome = int(qc_channel.outcome)
+    channel.outcome = outcome
 
     try:
-        await Channel.update_one(
-            filter_kwargs={"id": channel.id},
-            **{"$set": {"state_ids": channel.state_ids, "outcome": channel.outcome}},
+        result = await Channel.update_one(
+            filter_kwargs=unchanged_channel(channel.id, pre_state_ids),
+            **{
+                "$set": {
+                    "state_ids": channel.state_ids,
+                    "outcome": channel.outcome,
+                    "last_used": get_now(),
+                }
+            },
         )
     except Exception as e:
         await State.delete(id=post_state_id)
         logger.exception(e)
         raise HTTPException(status_code=500, detail="failed to update channel")
+    if result.matched_count == 0:
+        await State.delete(id=post_state_id)
+        message = f"channel with id '{id}' is changed by another request"
+        logger.exception(message)
+        raise HTTPException(status_code=409, detail=message)
 
     return {
         "message": "finalized",
         "state_id": post_state_id,
         "outcome": channel.outcome,
     }
+
+
+@app.websocket("/channel/{id}/ws")
+async def stream_channel(websocket: WebSocket, id: int):
+    await websocket.accept()
+    channel = await Channel.get(id=id)
+    if not channel or len(channel.state_ids) == 0:
+        message = f"channel with id '{id}' is not found or not initialized"
+        logger.exception(message)
+        await websocket.send_json({"detail": message})
+        await websocket.close(code=1008)
+        return
+
+    # states are pushed to the client as soon as they are computed and saved
+    # by a background writer in batches. a full queue blocks further commands.
+    pre_state = await load_last_state(channel)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=WEBSOCKET_QUEUE_SIZE)
+    writer = asyncio.create_task(
+        persist_channel_states(channel.id, list(channel.state_ids), queue, websocket)
+    )
+    try:
+        # the writer closes the socket when it fails to save states
+        while is_connected(websocket):
+            try:
+                command = json.loads(await websocket.receive_text())
+            except ValueError:
+                await send_if_connected(websocket, {"detail": "command must be json"})
+                continue
+            if not isinstance(command, dict):
+                await send_if_connected(
+                    websocket, {"detail": "command must be json object"}
+                )
+                continue
+
+            try:
+                post_state, response = await run_channel_command(
+                    channel, pre_state, command
+                )
+            except HTTPException as e:
+                await send_if_connected(websocket, {"detail": e.detail})
+                continue
+            except Exception as e:
+                logger.exception(e)
+                await send_if_connected(websocket, {"detail": "invalid command"})
+                continue
+
+            transformer_id = (
+                channel.transformer_ids[-1]
+                if response["message"] == "transformed"
+                else None
+            )
+            await queue.put((post_state, transformer_id, response.get("outcome")))
+            if command.get("probabilities"):
+                response["probabilities"] = parse_diagonal(post_state.qubits)
+            await send_if_connected(websocket, response)
+            pre_state = post_state
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await queue.put(None)
+        await writer
+
+
+async def run_channel_command(
+    channel: Channel, pre_state: State, command: dict
+) -> Tuple[State, dict]:
+    if channel.outcome is not None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"channel with id '{channel.id}' is already finalized",
+        )
+
+    if command.get("command") == "transform":
+        transformer_id = int(command["transformer_id"])
+        transformer_type, qc_transformer = await load_channel_transformer(
+            channel, transformer_id
+        )
+        post_state = transform_state(
+            channel,
+            pre_state,
+            transformer_type,
+            qc_transformer,
+            command.get("register_index"),
+        )
+        channel.transformer_ids.append(transformer_id)
+        channel.state_ids.append(post_state.id)
+        return post_state, {"message": "transformed", "state_id": post_state.id}
+
+    if command.get("command") == "finalize":
+        post_state, outcome = finalize_state(
+            channel, pre_state, list(map(int, command["output_indices"]))
+        )
+        channel.state_ids.append(post_state.id)
+        channel.outcome = outcome
+        return post_state, {
+            "message": "finalized",
+            "state_id": post_state.id,
+            "outcome": outcome,
+        }
+
+    raise HTTPException(status_code=400, detail="command must be transform or finalize")
+
+
+async def persist_channel_states(
+    channel_id: int,
+    saved_state_ids: List[int],
+    queue: asyncio.Queue,
+    websocket: WebSocket,
+) -> None:
+    collection = get_db_client().get_collection(State.get_db_collection())
+    failed = False
+    finished = False
+    while not finished:
+        items = [await queue.get()]
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        finished = items[-1] is None
+        if finished:
+            items.pop()
+        # after a failure the queue is only drained, so commands never block
+        if not items or failed:
+            continue
+
+        # channel is updated only after its states are saved, and only while
+        # no other request appended states since the last batch
+        state_ids = [state.id for state, _, _ in items]
+        update: Dict[str, Any] = {
+            "$push": {
+                "state_ids": {"$each": state_ids},
+                "transformer_ids": {
+                    "$each": [
+                        transformer_id
+                        for _, transformer_id, _ in items
+                        if transformer_id is not None
+                    ]
+                },
+            },
+            "$set": {"last_used": get_now()},
+        }
+        outcome = items[-1][2]
+        if outcome is not None:
+            update["$set"]["outcome"] = outcome
+        try:
+            await collection.insert_many([to_document(state) for state, _, _ in items])
+            result = await Channel.update_one(
+                filter_kwargs=unchanged_channel(channel_id, saved_state_ids),
+                **update,
+            )
+            if result.matched_count == 1:
+                saved_state_ids += state_ids
+                continue
+            message = f"channel with id '{channel_id}' is changed by another request"
+        except Exception as e:
+            logger.exception(e)
+            message = "failed to save channel states"
+
+        # states of the failed batch are not referenced by the channel
+        failed = True
+        try:
+            await State.delete(id={"$in": state_ids})
+        except Exception as e:
+            logger.exception(e)
+        if is_connected(websocket):
+            await websocket.send_json({"detail": message})
+            await websocket.close(code=1011)
+
+
+def is_connected(websocket: WebSocket) -> bool:
+    return (
+        websocket.client_state == WebSocketState.CONNECTED
+        and websocket.application_state == WebSocketState.CONNECTED
+    )
+
+
+async def send_if_connected(websocket: WebSocket, data: dict) -> None:
+    # the writer may close the socket while a command is running
+    if is_connected(websocket):
+        await websocket.send_json(data)
+
+
+def to_document(model) -> dict:
+    document = model.dict()
+    document["_id"] = document.pop("id")
+    return document
+
+
+async def load_channel_transformer(
+    channel: Channel, transformer_id: int
+) -> Tuple[TransformerType, Any]:
+    transformer = await Transformer.get(id=transformer_id)
+    if not transformer:
+        message = f"transformer with id '{transformer_id}' is not found"
+        logger.exception(message)
+        raise HTTPException(
+            status_code=404,
+            detail=message,
+        )
+
+    sanitized_matrix = translate_imaginary_string(remove_spaces(transformer.matrix))
+    evaled_matrix = [
+        list(map(lambda s: complex(eval(s)), row)) for row in sanitized_matrix
+    ]
+    try:
+        if transformer.type == TransformerType.OBSERVE:
+            qc_transformer = ObserveTransformer(Observable(evaled_matrix))
+        elif transformer.type == TransformerType.TIMEEVOLVE:
+            qc_transformer = TimeEvolveTransformer(TimeEvolution(evaled_matrix))
+        elif transformer.type == TransformerType.KRAUS:
+            qc_transformer = load_operators(transformer)
+            if qc_transformer.shape[-1] != 2 ** channel.qubit_count:
+                raise ValueError("kraus operators do not match qubit count")
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(
+            status_code=400, detail="cannot convert matrix to transformer"
+        )
+    return transformer.type, qc_transformer
+
+
+async def load_last_state(channel: Channel) -> State:
+    try:
+        return await State.get(id=channel.state_ids[-1])
+    except Exception as e:
+        logger.exception(e)
+        raise HTTPException(
+            status_code=400,
+            detail="this channel is not initialized",
+        )
+
+
+def restore_qc_channel(channel: Channel, state: State) -> qc.Channel:
+    qc_channel = qc.Channel(
+        qubit_count=channel.qubit_count,
+        register_count=channel.register_count,
+        init_transformers=[],
+    )
+    qc_registers = qr.Registers(len(state.registers))
+    for index, value in enumerate(state.registers):
+        qc_registers.put(index, value)
+
+    qc_qubits = Qubits(
+        [list(map(complex, row)) for row in translate_imaginary_string(state.qubits)]
+    )
+    qc_channel.states = [qs.State(qc_qubits, qc_registers)]
+    return qc_channel
+
+
+def transform_state(
+    channel: Channel,
+    pre_state: State,
+    transformer_type: TransformerType,
+    qc_transformer: Any,
+    register_index: Optional[int],
+) -> State:
+    qc_channel = restore_qc_channel(channel, pre_state)
+    if transformer_type == TransformerType.KRAUS:
+        # kraus channels act on the density matrix directly and keep registers
+        post_matrix = apply_kraus(qc_channel.states[-1].qubits.matrix, qc_transformer)
+    else:
+        qc_channel.transform(qc_transformer, register_index)
+        post_matrix = qc_channel.states[-1].qubits.matrix
+
+    # the state is not saved yet, but its id is already assigned
+    return State(
+        qubits=serialize_qubits(post_matrix, channel.precision),
+        registers=qc_channel.states[-1].registers.values,
+        precision=channel.precision,
+    )
+
+
+def finalize_state(
+    channel: Channel, pre_state: State, output_indices: List[int]
+) -> Tuple[State, int]:
+    qc_channel = restore_qc_channel(channel, pre_state)
+    qc_channel.finalize(output_indices)
+    post_state = State(
+        qubits=serialize_qubits(qc_channel.states[-1].qubits.matrix, channel.precision),
+        registers=qc_channel.states[-1].registers.values,
+        precision=channel.precision,
+    )
+    return post_state, int(qc_channel.outcome)
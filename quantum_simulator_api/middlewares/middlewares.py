@@ -0,0 +1,78 @@
+import cProfile
+import hmac
+import io
+import logging
+import pstats
+import random
+from typing import Optional
+
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from ..models.models import Profile
+
+logger = logging.getLogger("uvicorn")
+
+# only one profiler can be enabled at a time, so requests arriving while
+# another request is profiled are passed through unprofiled
+profiling = False
+
+
+class ProfilerMiddleware(BaseHTTPMiddleware):
+    def __init__(
+        self,
+        app,
+        token: str = "",
+        sample_rate: float = 0.0,
+        path_prefix: str = "/channel",
+        summary_lines: int = 30,
+    ):
+        super().__init__(app)
+        self.token = token
+        self.sample_rate = sample_rate
+        self.path_prefix = path_prefix
+        self.summary_lines = summary_lines
+
+    async def dispatch(self, request, call_next):
+        global profiling
+        if profiling or not request.url.path.startswith(self.path_prefix):
+            return await call_next(request)
+        requested = is_authorized(request.headers.get("x-profile-token"), self.token)
+        if not requested and random.random() >= self.sample_rate:
+            return await call_next(request)
+
+        # cProfile records the event loop thread, so coroutines of concurrent
+        # requests that run while this handler awaits are included as well
+        profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.disable()
+            profiling = False
+
+        try:
+            profile_id = await Profile(
+                method=request.method,
+                path=request.url.path,
+                sampled=not requested,
+                summary=summarize_profile(profiler, self.summary_lines),
+            ).save()
+        except Exception as e:
+            logger.exception(e)
+            return response
+        response.headers["X-Profile-Id"] = str(profile_id)
+        return response
+
+
+def is_authorized(given_token: Optional[str], token: str) -> bool:
+    if not token or not given_token:
+        return False
+    return hmac.compare_digest(given_token, token)
+
+
+def summarize_profile(profiler: cProfile.Profile, lines: int) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(lines)
+    return stream.getvalue()
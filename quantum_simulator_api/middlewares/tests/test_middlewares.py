@@ -0,0 +1,82 @@
+import cProfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ...models.models import Profile
+from .. import middlewares
+from ..middlewares import ProfilerMiddleware, is_authorized, summarize_profile
+
+app = FastAPI()
+app.add_middleware(ProfilerMiddleware, token="secret")
+
+
+@app.get("/channel/")
+async def list_channel():
+    return {"channels": []}
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"message": "healthy"}
+
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="function")
+def saved_profiles(monkeypatch):
+    profiles = []
+
+    async def save(self):
+        profiles.append(self)
+        return len(profiles)
+
+    monkeypatch.setattr(Profile, "save", save)
+    return profiles
+
+
+def test_dispatch_with_token(saved_profiles):
+    response = client.get("/channel/", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["x-profile-id"] == "1"
+    assert saved_profiles[0].path == "/channel/"
+    assert not saved_profiles[0].sampled
+    assert "function calls" in saved_profiles[0].summary
+
+
+def test_dispatch_without_token(saved_profiles):
+    response = client.get("/channel/", headers={"X-Profile-Token": "wrong"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert saved_profiles == []
+
+
+def test_dispatch_outside_path_prefix(saved_profiles):
+    response = client.get("/healthz", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+
+
+def test_dispatch_while_profiling(saved_profiles, monkeypatch):
+    monkeypatch.setattr(middlewares, "profiling", True)
+    response = client.get("/channel/", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert saved_profiles == []
+
+
+def test_is_authorized():
+    assert is_authorized("secret", "secret")
+    assert not is_authorized("wrong", "secret")
+    assert not is_authorized(None, "secret")
+    assert not is_authorized("", "")
+
+
+def test_summarize_profile():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    sorted(range(100))
+    profiler.disable()
+    assert "function calls" in summarize_profile(profiler, 10)
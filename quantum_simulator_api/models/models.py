@@ -1,34 +1,48 @@
-from enum import IntEnum, auto
+import os
+from datetime import datetime
+from enum import Enum, IntEnum, auto
 from typing import List, Optional
 
-from fastapi_contrib.db.models import MongoDBModel
-from pydantic import Field
+from fastapi_contrib.common.utils import get_now
+from fastapi_contrib.db.models import MongoDBModel, MongoDBTimeStampedModel
+from pydantic import Field, validator
+from pymongo import ASCENDING, IndexModel
+
+PROFILE_TTL_SECONDS = int(os.environ.get("PROFILE_TTL_SECONDS", "604800"))
 
 
 class TransformerType(IntEnum):
     OBSERVE = auto()
     TIMEEVOLVE = auto()
+    KRAUS = auto()
+
+
+class Precision(str, Enum):
+    COMPLEX64 = "complex64"
+    COMPLEX128 = "complex128"
 
 
 class Transformer(MongoDBModel):
     type: TransformerType
     name: str = ""
-    matrix: List[List[str]]
+    matrix: List[List[str]] = []
+    operators: List[List[List[str]]] = []
     target_qubit_count: int
 
     class Meta:
         collection = "transformer"
 
 
-class State(MongoDBModel):
+class State(MongoDBTimeStampedModel):
     qubits: List[List[str]]
     registers: List[int]
+    precision: Precision = Precision.COMPLEX128
 
     class Meta:
         collection = "state"
 
 
-class Channel(MongoDBModel):
+class Channel(MongoDBTimeStampedModel):
     name: str = ""
     qubit_count: int = Field(1, ge=1, le=8)
     register_count: int = Field(1, ge=1, le=8)
@@ -36,6 +50,34 @@ class Channel(MongoDBModel):
     state_ids: List[int] = []
     transformer_ids: List[int] = []
     outcome: Optional[int] = None
+    parent_id: Optional[int] = None
+    precision: Precision = Precision.COMPLEX128
+    last_used: Optional[datetime] = None
+
+    @validator("last_used", pre=True, always=True)
+    def set_last_used_now(cls, v: datetime) -> datetime:
+        if v:
+            return v
+        return get_now()
 
     class Meta:
         collection = "channel"
+        indexes = [
+            IndexModel([("state_ids", ASCENDING)]),
+            IndexModel([("init_transformer_ids", ASCENDING)]),
+            IndexModel([("transformer_ids", ASCENDING)]),
+            IndexModel([("last_used", ASCENDING)]),
+        ]
+
+
+class Profile(MongoDBTimeStampedModel):
+    method: str
+    path: str
+    sampled: bool = False
+    summary: str
+
+    class Meta:
+        collection = "profile"
+        indexes = [
+            IndexModel([("created", ASCENDING)], expireAfterSeconds=PROFILE_TTL_SECONDS)
+        ]
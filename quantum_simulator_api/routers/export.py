@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import zipfile
+from typing import IO, AsyncIterator, List, Union, cast
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi_contrib.db.utils import get_db_client
+
+from ..models.models import Channel, State
+from ..serializers.serializers import ExportFormat, ExportSerializer
+from ..utils.utils import parse_matrix
+
+router = APIRouter(prefix="", tags=["export"])
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "100"))
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.NPZ: "application/zip",
+}
+
+
+# export api
+@router.get("/channel/{id}/export")
+async def export_channel(id: int, format: ExportFormat = ExportFormat.NDJSON):
+    if not await Channel.count(id=id):
+        raise HTTPException(status_code=404, detail="not found")
+    return export_response([id], format, f"channel_{id}")
+
+
+@router.post("/export/")
+async def export_channels(serializer: ExportSerializer):
+    channel_ids = list(dict.fromkeys(serializer.channel_ids))
+    if await Channel.count(id={"$in": channel_ids}) != len(channel_ids):
+        raise HTTPException(status_code=404, detail="some channels are not found")
+    return export_response(channel_ids, serializer.format, "channels")
+
+
+def export_response(
+    channel_ids: List[int], format: ExportFormat, filename: str
+) -> StreamingResponse:
+    content: Union[AsyncIterator[str], AsyncIterator[bytes]]
+    if format == ExportFormat.NPZ:
+        content = stream_npz(channel_ids)
+        filename = f"{filename}.npz"
+    else:
+        content = stream_ndjson(channel_ids)
+        filename = f"{filename}.ndjson"
+    return StreamingResponse(
+        content,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+async def iterate_states(state_ids: List[int]) -> AsyncIterator[dict]:
+    # fetch states with batched $in queries, so memory does not depend on
+    # the history length, and yield them in the order of the channel history
+    collection = get_db_client().get_collection(State.get_db_collection())
+    for start in range(0, len(state_ids), EXPORT_BATCH_SIZE):
+        stop = start + EXPORT_BATCH_SIZE
+        batch_ids = state_ids[start:stop]
+        documents = {}
+        async for document in collection.find({"_id": {"$in": batch_ids}}):
+            document["id"] = document.pop("_id")
+            documents[document["id"]] = document
+        for state_id in batch_ids:
+            if state_id in documents:
+                yield documents[state_id]
+
+
+async def stream_ndjson(channel_ids: List[int]) -> AsyncIterator[str]:
+    for channel_id in channel_ids:
+        channel = await Channel.get(id=channel_id)
+        if not channel:
+            continue
+        yield json.dumps({"type": "channel", **channel.dict()}, default=str) + "\n"
+        async for state in iterate_states(channel.state_ids):
+            line = {"type": "state", "channel_id": channel.id, **state}
+            yield json.dumps(line, default=str) + "\n"
+
+
+class ArchiveBuffer(io.RawIOBase):
+    """unseekable file object collecting bytes written by zipfile"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+async def stream_npz(channel_ids: List[int]) -> AsyncIterator[bytes]:
+    buffer = ArchiveBuffer()
+    with zipfile.ZipFile(cast(IO[bytes], buffer), mode="w") as archive:
+        for channel_id in channel_ids:
+            channel = await Channel.get(id=channel_id)
+            if not channel:
+                continue
+            archive.writestr(
+                f"{channel.id}/channel.json", json.dumps(channel.dict(), default=str)
+            )
+            yield buffer.pop()
+            async for state in iterate_states(channel.state_ids):
+                arrays = {
+                    "qubits": np.array(
+                        parse_matrix(state["qubits"]),
+                        dtype=state.get("precision", "complex128"),
+                    ),
+                    "registers": np.array(state["registers"], dtype=np.int64),
+                }
+                for name, array in arrays.items():
+                    path = f"{channel.id}/{name}/{state['id']}.npy"
+                    with archive.open(path, mode="w", force_zip64=True) as entry:
+                        np.lib.format.write_array(entry, array, allow_pickle=False)
+                yield buffer.pop()
+    yield buffer.pop()
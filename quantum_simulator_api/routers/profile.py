@@ -0,0 +1,44 @@
+import os
+from typing import Dict, List
+
+from fastapi import APIRouter, Header, HTTPException
+
+from ..middlewares.middlewares import is_authorized
+from ..models.models import Profile
+
+router = APIRouter(prefix="/profile", tags=["profile"])
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+
+# profile api
+@router.get("/", response_model=Dict[str, List[Dict]])
+async def list_profile(x_profile_token: str = Header(None)):
+    check_profile_token(x_profile_token)
+    profiles = await Profile.list()
+    return {
+        "profiles": [
+            {
+                "id": profile["id"],
+                "method": profile["method"],
+                "path": profile["path"],
+                "sampled": profile["sampled"],
+            }
+            for profile in profiles
+        ]
+    }
+
+
+@router.get("/{id}", response_model=dict)
+async def get_profile(id: int, x_profile_token: str = Header(None)):
+    check_profile_token(x_profile_token)
+    profile = await Profile.get(id=id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="not found")
+    return profile
+
+
+def check_profile_token(given_token: str) -> None:
+    # profiles are hidden when no token is configured
+    if not is_authorized(given_token, PROFILE_TOKEN):
+        raise HTTPException(status_code=403, detail="invalid profile token")
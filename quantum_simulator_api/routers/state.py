@@ -1,8 +1,28 @@
-from typing import Dict, List
+import logging
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-from ..models.models import State
+from ..kernels.kernels import (
+    cast_density_matrix,
+    count_qubits,
+    expectations,
+    marginal_probabilities,
+    partial_trace,
+)
+from ..models.models import State, TransformerType
+from ..utils.utils import (
+    CACHE_CONTROL,
+    compute_etag,
+    match_etag,
+    parse_diagonal,
+    parse_matrix,
+    translate_imaginary_symbol,
+)
+from .transformer import load_matrix
+
+logger = logging.getLogger("uvicorn")
 
 router = APIRouter(prefix="/state", tags=["state"])
 
@@ -15,8 +35,75 @@ async def list_state():
 
 
 @router.get("/{id}", response_model=dict)
-async def get_state(id: int):
+async def get_state(id: int, request: Request, response: Response):
     state = await State.get(id=id)
     if not state:
         raise HTTPException(status_code=404, detail="not found")
+
+    # states are immutable once saved, so clients can cache them forever
+    headers = {"ETag": compute_etag(state.dict()), "Cache-Control": CACHE_CONTROL}
+    if match_etag(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return state
+
+
+@router.get("/{id}/probabilities", response_model=Dict[str, List[float]])
+async def get_probabilities_of_state(
+    id: int, qubits: Optional[List[int]] = Query(None)
+):
+    state = await load_state(id)
+    # only the 2^n diagonal entries are parsed, not all 4^n matrix entries
+    diagonal = np.array(parse_diagonal(state.qubits))
+    qubits = validate_qubits(qubits, count_qubits(diagonal))
+    return {"probabilities": marginal_probabilities(diagonal, qubits).tolist()}
+
+
+@router.get("/{id}/expectation", response_model=Dict[str, float])
+async def get_expectation_of_state(id: int, transformer_id: int):
+    state = await load_state(id)
+    density_matrix = np.array(parse_matrix(state.qubits))
+    observable = await load_matrix(transformer_id, TransformerType.OBSERVE)
+    if observable.shape != density_matrix.shape:
+        raise HTTPException(
+            status_code=400,
+            detail=f"transformer with id '{transformer_id}' "
+            "does not match qubit count of state",
+        )
+    return {"expectation": float(expectations(density_matrix, observable))}
+
+
+@router.get("/{id}/reduced", response_model=dict)
+async def get_reduced_state(id: int, keep: List[int] = Query(...)):
+    state = await load_state(id)
+    density_matrix = np.array(parse_matrix(state.qubits))
+    keep = validate_qubits(keep, count_qubits(density_matrix))
+    reduced_matrix = cast_density_matrix(
+        partial_trace(density_matrix, keep), state.precision.value
+    )
+    return {
+        "keep": keep,
+        "qubits": translate_imaginary_symbol(reduced_matrix.astype(str).tolist()),
+    }
+
+
+async def load_state(id: int) -> State:
+    state = await State.get(id=id)
+    if not state:
+        message = f"state with id '{id}' is not found"
+        logger.exception(message)
+        raise HTTPException(status_code=404, detail=message)
+    return state
+
+
+def validate_qubits(qubits: Optional[List[int]], qubit_count: int) -> List[int]:
+    if qubits is None:
+        return list(range(qubit_count))
+    if len(set(qubits)) != len(qubits) or not all(
+        0 <= qubit < qubit_count for qubit in qubits
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"qubits must be distinct indices less than {qubit_count}",
+        )
+    return qubits
@@ -0,0 +1,198 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from ..kernels.kernels import (
+    apply_kraus,
+    apply_unitaries,
+    apply_unitaries_to_vectors,
+    cast_density_matrix,
+    evaluate_template,
+    expand_parameter_grid,
+    expectations,
+    initial_density_matrices,
+    initial_state_vectors,
+    is_unitary,
+    probabilities,
+    sample_kraus,
+    trajectory_expectations,
+    trajectory_probabilities,
+)
+from ..models.models import TransformerType
+from ..serializers.serializers import SweepSerializer
+from ..utils.utils import evaluate_matrix
+from .transformer import load_matrix, load_operators, load_transformer
+
+logger = logging.getLogger("uvicorn")
+
+router = APIRouter(prefix="/sweep", tags=["sweep"])
+
+SWEEP_BATCH_SIZE = int(os.environ.get("SWEEP_BATCH_SIZE", "256"))
+SWEEP_MAX_POINTS = int(os.environ.get("SWEEP_MAX_POINTS", "65536"))
+SWEEP_MAX_TRAJECTORIES = int(os.environ.get("SWEEP_MAX_TRAJECTORIES", "10000"))
+
+
+# sweep api
+@router.post("/", response_model=dict)
+async def sweep(serializer: SweepSerializer):
+    dim = 2 ** serializer.qubit_count
+    dtype = serializer.precision.value
+    if "i" in serializer.parameters:
+        raise HTTPException(
+            status_code=400, detail="parameter name 'i' is reserved for imaginary unit"
+        )
+    point_count = int(
+        np.prod([len(values) for values in serializer.parameters.values()])
+    )
+    if point_count == 0:
+        raise HTTPException(
+            status_code=400, detail="parameter values must not be empty"
+        )
+    if point_count > SWEEP_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"parameter grid exceeds {SWEEP_MAX_POINTS} points",
+        )
+    trajectory_count = serializer.trajectory_count
+    if trajectory_count is not None and trajectory_count > SWEEP_MAX_TRAJECTORIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"trajectory count exceeds {SWEEP_MAX_TRAJECTORIES}",
+        )
+
+    # resolve fixed transformers once. templates stay as strings
+    steps: List[Tuple[str, Any]] = []
+    for step in serializer.steps:
+        transformer_id, template = step.transformer_id, step.template
+        if transformer_id is None and template is not None:
+            if len(template) != dim:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"template size does not match qubit count {dim}",
+                )
+            steps.append(("template", template))
+            continue
+        if transformer_id is None or template is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="each step needs exactly one of transformer_id or template",
+            )
+
+        transformer = await load_transformer(transformer_id)
+        if transformer.type == TransformerType.TIMEEVOLVE:
+            operator = np.array(evaluate_matrix(transformer.matrix))
+            steps.append(("unitary", operator.astype(dtype)))
+        elif transformer.type == TransformerType.KRAUS:
+            operator = load_operators(transformer)
+            steps.append(("kraus", operator.astype(dtype)))
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"transformer with id '{transformer_id}' "
+                "cannot be used as sweep step",
+            )
+        if operator.shape[-2:] != (dim, dim):
+            raise HTTPException(
+                status_code=400,
+                detail=f"transformer with id '{transformer_id}' "
+                "does not match qubit count",
+            )
+
+    observable = None
+    if serializer.observable_id is not None:
+        observable = await load_matrix(
+            serializer.observable_id, TransformerType.OBSERVE
+        )
+        if observable.shape != (dim, dim):
+            raise HTTPException(
+                status_code=400,
+                detail=f"transformer with id '{serializer.observable_id}' "
+                "does not match qubit count",
+            )
+
+    # the simulation is cpu bound, so it runs in the threadpool instead of
+    # blocking the event loop for other requests and websocket streams
+    return await run_in_threadpool(
+        simulate_sweep, serializer, steps, observable, point_count
+    )
+
+
+def simulate_sweep(
+    serializer: SweepSerializer,
+    steps: List[Tuple[str, Any]],
+    observable: Optional[np.ndarray],
+    point_count: int,
+) -> Dict:
+    dim = 2 ** serializer.qubit_count
+    dtype = serializer.precision.value
+
+    # simulate every grid point at once, chunked to bound memory. trajectory
+    # mode keeps (batch, trajectories, 2^n) state vectors instead of
+    # (batch, 2^n, 2^n) density matrices and samples kraus branches. its
+    # chunks shrink so they never hold more values than a density matrix chunk
+    rng = np.random.default_rng(serializer.seed)
+    trajectory_count = serializer.trajectory_count
+    chunk_size = SWEEP_BATCH_SIZE
+    if trajectory_count is not None:
+        chunk_size = max(1, SWEEP_BATCH_SIZE * dim // trajectory_count)
+    grid = expand_parameter_grid(serializer.parameters)
+    results: List[np.ndarray] = []
+    for start in range(0, point_count, chunk_size):
+        stop = min(start + chunk_size, point_count)
+        chunk = {name: values[start:stop] for name, values in grid.items()}
+        batch_size = stop - start
+        if trajectory_count is None:
+            states = initial_density_matrices(serializer.qubit_count, batch_size, dtype)
+        else:
+            states = initial_state_vectors(
+                serializer.qubit_count, batch_size, trajectory_count, dtype
+            )
+
+        for kind, matrix in steps:
+            if kind == "template":
+                try:
+                    matrix = evaluate_template(matrix, chunk, batch_size)
+                except Exception as e:
+                    logger.exception(e)
+                    raise HTTPException(
+                        status_code=400, detail="cannot evaluate template"
+                    )
+                if not is_unitary(matrix):
+                    raise HTTPException(
+                        status_code=400, detail="template is not time evolution"
+                    )
+                matrix = matrix.astype(dtype)
+
+            if trajectory_count is None:
+                if kind == "kraus":
+                    states = apply_kraus(states, matrix)
+                else:
+                    states = apply_unitaries(states, matrix)
+                states = cast_density_matrix(states, dtype)
+            elif kind == "kraus":
+                states = sample_kraus(states, matrix, rng)
+            else:
+                states = apply_unitaries_to_vectors(states, matrix)
+
+        if observable is None:
+            if trajectory_count is None:
+                results.append(probabilities(states))
+            else:
+                results.append(trajectory_probabilities(states))
+        elif trajectory_count is None:
+            results.append(expectations(states, observable))
+        else:
+            results.append(trajectory_expectations(states, observable))
+
+    response: Dict = {
+        "parameters": {name: values.tolist() for name, values in grid.items()}
+    }
+    if observable is None:
+        response["probabilities"] = np.concatenate(results).tolist()
+    else:
+        response["expectations"] = np.concatenate(results).tolist()
+    return response
@@ -4,11 +4,12 @@ import os
 import pytest
 from dotenv import load_dotenv
 from fastapi_contrib.conf import settings
-from fastapi_contrib.db.utils import setup_mongodb
+from fastapi_contrib.db.utils import get_db_client, setup_mongodb
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 
 from ...main import app
-from ...models.models import Channel, State, Transformer, TransformerType
+from ...models.models import Channel, Profile, State, Transformer, TransformerType
 
 # set fastapi contrib config for test
 load_dotenv(f"{os.getcwd()}/.env")
@@ -25,6 +26,24 @@ def use_test_db():
     cleanup_client.drop_database(settings.mongodb_dbname)
 
 
+@pytest.fixture(scope="function")
+def use_websocket_db(use_test_db, monkeypatch):
+    # websocket sessions of TestClient run the app on a new event loop in
+    # another thread, and motor clients only work on the loop they are created
+    databases = {}
+
+    class EventLoopDatabase:
+        def get_collection(self, name, **kwargs):
+            loop = asyncio.get_event_loop()
+            if loop not in databases:
+                client = AsyncIOMotorClient(settings.mongodb_dsn)
+                databases[loop] = client[settings.mongodb_dbname]
+            return databases[loop].get_collection(name, **kwargs)
+
+    monkeypatch.setattr(get_db_client(), "mongodb", EventLoopDatabase())
+    yield
+
+
 @pytest.fixture(scope="session")
 def event_loop():
     loop = asyncio.get_event_loop()
@@ -55,6 +74,42 @@ async def create_transformer():
     return transformer_id
 
 
+@pytest.fixture(scope="function")
+async def create_not_transformer():
+    transformer_id = await Transformer(
+        type=TransformerType.TIMEEVOLVE,
+        name="test pauli x time evolve transformer",
+        matrix=[["0", "1"], ["1", "0"]],
+        target_qubit_count=1,
+    ).save()
+    return transformer_id
+
+
+@pytest.fixture(scope="function")
+async def create_observable():
+    transformer_id = await Transformer(
+        type=TransformerType.OBSERVE,
+        name="test pauli z observable",
+        matrix=[["1", "0"], ["0", "-1"]],
+        target_qubit_count=1,
+    ).save()
+    return transformer_id
+
+
+@pytest.fixture(scope="function")
+async def create_kraus_transformer():
+    transformer_id = await Transformer(
+        type=TransformerType.KRAUS,
+        name="test bit flip kraus transformer",
+        operators=[
+            [["sqrt(0.7)", "0"], ["0", "sqrt(0.7)"]],
+            [["0", "sqrt(0.3)"], ["sqrt(0.3)", "0"]],
+        ],
+        target_qubit_count=1,
+    ).save()
+    return transformer_id
+
+
 @pytest.fixture(scope="function")
 async def transformer_params():
     transformer_type = TransformerType.OBSERVE
@@ -80,3 +135,32 @@ async def create_channel_with_transformer(create_transformer):
     transformer_ids = [create_transformer]
     channel_id = await Channel(name=name, transformer_ids=transformer_ids).save()
     return {"channel_id": channel_id, "transformer_id": create_transformer}
+
+
+@pytest.fixture(scope="function")
+async def create_channel_with_state(create_state):
+    name = "test channel with state"
+    channel_id = await Channel(name=name, state_ids=[create_state]).save()
+    return {"channel_id": channel_id, "state_id": create_state}
+
+
+@pytest.fixture(scope="function")
+async def create_finalized_channel(create_transformer):
+    # initialized, transformed once and finalized
+    qubit = [["1", "0"], ["0", "0"]]
+    state_ids = [await State(qubits=qubit, registers=[0]).save() for _ in range(3)]
+    channel_id = await Channel(
+        name="test finalized channel",
+        state_ids=state_ids,
+        transformer_ids=[create_transformer],
+        outcome=0,
+    ).save()
+    return {"channel_id": channel_id, "state_ids": state_ids}
+
+
+@pytest.fixture(scope="function")
+async def create_profile():
+    profile_id = await Profile(
+        method="GET", path="/channel/", summary="test profile summary"
+    ).save()
+    return profile_id
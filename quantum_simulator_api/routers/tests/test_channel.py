@@ -0,0 +1,321 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from fastapi_contrib.common.utils import get_now
+from starlette.websockets import WebSocketDisconnect
+
+from ... import main
+from ...main import app, backfill_last_used, expire_channels, remove_channel
+from ...models.models import Channel, Precision, State
+from ...utils.utils import parse_diagonal
+
+client = TestClient(app)
+
+
+def test_fork_channel(use_test_db, create_finalized_channel):
+    event_loop = asyncio.get_event_loop()
+    channel_id = create_finalized_channel["channel_id"]
+    state_ids = create_finalized_channel["state_ids"]
+    response = client.post(
+        f"/channel/{channel_id}/fork", params={"at_state": state_ids[1]}
+    )
+    assert response.status_code == 200
+
+    parent = event_loop.run_until_complete(Channel.get(id=channel_id))
+    fork = event_loop.run_until_complete(Channel.get(id=int(response.json()["id"])))
+    assert fork.parent_id == channel_id
+    assert fork.state_ids == parent.state_ids[:2]
+    assert fork.transformer_ids == parent.transformer_ids[:1]
+    assert fork.outcome is None
+
+
+def test_fork_channel_at_finalized_state(use_test_db, create_finalized_channel):
+    event_loop = asyncio.get_event_loop()
+    channel_id = create_finalized_channel["channel_id"]
+    response = client.post(f"/channel/{channel_id}/fork")
+    assert response.status_code == 200
+
+    fork = event_loop.run_until_complete(Channel.get(id=int(response.json()["id"])))
+    assert fork.state_ids == create_finalized_channel["state_ids"]
+    assert fork.outcome == 0
+
+
+def test_fork_channel_with_unrecorded_state(use_test_db, create_finalized_channel):
+    channel_id = create_finalized_channel["channel_id"]
+    response = client.post(f"/channel/{channel_id}/fork", params={"at_state": 0})
+    assert response.status_code == 400
+
+
+def test_delete_forked_channel(use_test_db, create_finalized_channel):
+    event_loop = asyncio.get_event_loop()
+    channel_id = create_finalized_channel["channel_id"]
+    state_ids = create_finalized_channel["state_ids"]
+    response = client.post(
+        f"/channel/{channel_id}/fork", params={"at_state": state_ids[1]}
+    )
+    fork_id = int(response.json()["id"])
+
+    # states shared with the fork survive deleting the parent
+    response = client.delete(f"/channel/{channel_id}")
+    assert response.status_code == 200
+    states = [
+        event_loop.run_until_complete(State.get(id=state_id)) for state_id in state_ids
+    ]
+    assert [state is not None for state in states] == [True, True, False]
+
+    # and are removed with the last channel referencing them
+    response = client.delete(f"/channel/{fork_id}")
+    assert response.status_code == 200
+    states = [
+        event_loop.run_until_complete(State.get(id=state_id)) for state_id in state_ids
+    ]
+    assert states == [None, None, None]
+
+
+def test_channel_with_complex64_precision(use_test_db, create_not_transformer):
+    event_loop = asyncio.get_event_loop()
+    response = client.post("/channel/", json={"precision": "complex64"})
+    assert response.status_code == 200
+    channel_id = int(response.json()["id"])
+
+    response = client.put(f"/channel/{channel_id}/initialize")
+    assert response.status_code == 200
+    response = client.put(
+        f"/channel/{channel_id}/transform",
+        params={"transformer_id": create_not_transformer},
+    )
+    assert response.status_code == 200
+
+    channel = event_loop.run_until_complete(Channel.get(id=channel_id))
+    assert channel.precision == Precision.COMPLEX64
+    states = [
+        event_loop.run_until_complete(State.get(id=state_id))
+        for state_id in channel.state_ids
+    ]
+    assert [state.precision for state in states] == [Precision.COMPLEX64] * 2
+    probabilities = parse_diagonal(states[-1].qubits)
+    assert [round(value, 6) for value in probabilities] == [0, 1]
+
+
+def test_remove_channel(use_test_db, create_channel_with_state):
+    event_loop = asyncio.get_event_loop()
+    state_id = create_channel_with_state["state_id"]
+    channel = event_loop.run_until_complete(
+        Channel.get(id=create_channel_with_state["channel_id"])
+    )
+    other_channel = Channel(name="test channel sharing state", state_ids=[state_id])
+    event_loop.run_until_complete(other_channel.save())
+
+    event_loop.run_until_complete(remove_channel(channel))
+    assert event_loop.run_until_complete(Channel.get(id=channel.id)) is None
+    assert event_loop.run_until_complete(State.get(id=state_id)) is not None
+
+    event_loop.run_until_complete(remove_channel(other_channel))
+    assert event_loop.run_until_complete(State.get(id=state_id)) is None
+
+
+def test_expire_idle_channels(use_test_db, create_state, monkeypatch):
+    monkeypatch.setattr(main, "CHANNEL_IDLE_TTL_SECONDS", 3600)
+    event_loop = asyncio.get_event_loop()
+    idle_channel_id = event_loop.run_until_complete(
+        Channel(
+            state_ids=[create_state], last_used=get_now() - timedelta(hours=2)
+        ).save()
+    )
+    used_channel_id = event_loop.run_until_complete(Channel().save())
+
+    assert event_loop.run_until_complete(expire_channels()) == 1
+    assert event_loop.run_until_complete(Channel.get(id=idle_channel_id)) is None
+    assert event_loop.run_until_complete(State.get(id=create_state)) is None
+    assert event_loop.run_until_complete(Channel.get(id=used_channel_id)) is not None
+
+
+def test_expire_finalized_channels(use_test_db, monkeypatch):
+    monkeypatch.setattr(main, "CHANNEL_FINALIZED_TTL_SECONDS", 3600)
+    monkeypatch.setattr(main, "CHANNEL_IDLE_TTL_SECONDS", 0)
+    event_loop = asyncio.get_event_loop()
+    last_used = get_now() - timedelta(hours=2)
+    finalized_channel_id = event_loop.run_until_complete(
+        Channel(outcome=0, last_used=last_used).save()
+    )
+    idle_channel_id = event_loop.run_until_complete(Channel(last_used=last_used).save())
+
+    assert event_loop.run_until_complete(expire_channels()) == 1
+    assert event_loop.run_until_complete(Channel.get(id=finalized_channel_id)) is None
+    assert event_loop.run_until_complete(Channel.get(id=idle_channel_id)) is not None
+
+
+def test_expire_channels_without_last_used(use_test_db, monkeypatch):
+    monkeypatch.setattr(main, "CHANNEL_IDLE_TTL_SECONDS", 3600)
+    event_loop = asyncio.get_event_loop()
+    channel_id = event_loop.run_until_complete(Channel().save())
+    event_loop.run_until_complete(
+        Channel.update_one(
+            filter_kwargs={"id": channel_id},
+            **{
+                "$set": {"created": get_now() - timedelta(hours=2)},
+                "$unset": {"last_used": ""},
+            },
+        )
+    )
+
+    event_loop.run_until_complete(backfill_last_used())
+    assert event_loop.run_until_complete(expire_channels()) == 1
+    assert event_loop.run_until_complete(Channel.get(id=channel_id)) is None
+
+
+def test_get_channel_with_expand(use_test_db, create_finalized_channel):
+    channel_id = create_finalized_channel["channel_id"]
+    state_ids = create_finalized_channel["state_ids"]
+    response = client.get(
+        f"/channel/{channel_id}",
+        params={"expand": "states,transformers", "state_limit": 2},
+    )
+    assert response.status_code == 200
+    channel = response.json()
+    assert [state["id"] for state in channel["states"]] == state_ids[-2:]
+    assert channel["states"][0]["probabilities"] == [1, 0]
+    assert "qubits" not in channel["states"][0]
+    assert [transformer["id"] for transformer in channel["transformers"]] == (
+        channel["transformer_ids"]
+    )
+    assert channel["init_transformers"] == []
+
+    response = client.get(
+        f"/channel/{channel_id}", params={"expand": "states", "include_qubits": True}
+    )
+    assert response.status_code == 200
+    assert len(response.json()["states"]) == 3
+    assert response.json()["states"][0]["qubits"] == [["1", "0"], ["0", "0"]]
+
+
+def test_get_channel_with_invalid_expand(use_test_db, create_finalized_channel):
+    channel_id = create_finalized_channel["channel_id"]
+    response = client.get(f"/channel/{channel_id}", params={"expand": "outcome"})
+    assert response.status_code == 400
+
+    response = client.get(
+        f"/channel/{channel_id}", params={"expand": "states", "state_limit": 1000}
+    )
+    assert response.status_code == 422
+
+
+def test_stream_channel(
+    use_websocket_db, create_channel_with_state, create_not_transformer
+):
+    event_loop = asyncio.get_event_loop()
+    channel_id = create_channel_with_state["channel_id"]
+    with client.websocket_connect(f"/channel/{channel_id}/ws") as websocket:
+        websocket.send_json(
+            {
+                "command": "transform",
+                "transformer_id": create_not_transformer,
+                "probabilities": True,
+            }
+        )
+        transformed = websocket.receive_json()
+        assert transformed["message"] == "transformed"
+        assert [round(value, 6) for value in transformed["probabilities"]] == [0, 1]
+
+        websocket.send_json({"command": "finalize", "output_indices": [0]})
+        finalized = websocket.receive_json()
+        assert finalized["message"] == "finalized"
+
+        websocket.send_json({"command": "finalize", "output_indices": [0]})
+        assert "detail" in websocket.receive_json()
+
+    # states are saved by the writer before the session is closed
+    channel = event_loop.run_until_complete(Channel.get(id=channel_id))
+    assert channel.state_ids == [
+        create_channel_with_state["state_id"],
+        transformed["state_id"],
+        finalized["state_id"],
+    ]
+    assert channel.transformer_ids == [create_not_transformer]
+    assert channel.outcome == finalized["outcome"]
+    state = event_loop.run_until_complete(State.get(id=finalized["state_id"]))
+    assert state is not None
+
+
+def test_stream_channel_with_invalid_command(
+    use_websocket_db, create_channel_with_state
+):
+    event_loop = asyncio.get_event_loop()
+    channel_id = create_channel_with_state["channel_id"]
+    with client.websocket_connect(f"/channel/{channel_id}/ws") as websocket:
+        websocket.send_text("transform")
+        assert websocket.receive_json() == {"detail": "command must be json"}
+        websocket.send_json(["transform"])
+        assert websocket.receive_json() == {"detail": "command must be json object"}
+        websocket.send_json({"command": "measure"})
+        assert "detail" in websocket.receive_json()
+        websocket.send_json({"command": "transform", "transformer_id": "x"})
+        assert websocket.receive_json() == {"detail": "invalid command"}
+
+    channel = event_loop.run_until_complete(Channel.get(id=channel_id))
+    assert channel.state_ids == [create_channel_with_state["state_id"]]
+    assert channel.transformer_ids == []
+
+
+def test_stream_channel_with_failed_save(
+    use_websocket_db, create_channel_with_state, create_not_transformer, monkeypatch
+):
+    async def update_one(*args, **kwargs):
+        raise RuntimeError("update failed")
+
+    event_loop = asyncio.get_event_loop()
+    monkeypatch.setattr(Channel, "update_one", update_one)
+    channel_id = create_channel_with_state["channel_id"]
+    with client.websocket_connect(f"/channel/{channel_id}/ws") as websocket:
+        websocket.send_json(
+            {"command": "transform", "transformer_id": create_not_transformer}
+        )
+        transformed = websocket.receive_json()
+        assert transformed["message"] == "transformed"
+        assert websocket.receive_json() == {"detail": "failed to save channel states"}
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+    # saved states of the failed batch are removed again
+    state = event_loop.run_until_complete(State.get(id=transformed["state_id"]))
+    assert state is None
+
+
+def test_stream_channel_with_concurrent_transform(
+    use_websocket_db, create_channel_with_state, create_not_transformer
+):
+    event_loop = asyncio.get_event_loop()
+    channel_id = create_channel_with_state["channel_id"]
+    with client.websocket_connect(f"/channel/{channel_id}/ws") as websocket:
+        response = client.put(
+            f"/channel/{channel_id}/transform",
+            params={"transformer_id": create_not_transformer},
+        )
+        assert response.status_code == 200
+
+        websocket.send_json(
+            {"command": "transform", "transformer_id": create_not_transformer}
+        )
+        transformed = websocket.receive_json()
+        assert "changed by another request" in websocket.receive_json()["detail"]
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+    # only the http transform is recorded
+    channel = event_loop.run_until_complete(Channel.get(id=channel_id))
+    assert channel.state_ids == [
+        create_channel_with_state["state_id"],
+        int(response.json()["state_id"]),
+    ]
+    assert channel.transformer_ids == [create_not_transformer]
+    state = event_loop.run_until_complete(State.get(id=transformed["state_id"]))
+    assert state is None
+
+
+def test_stream_channel_not_initialized(use_websocket_db):
+    with client.websocket_connect("/channel/0/ws") as websocket:
+        assert "detail" in websocket.receive_json()
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
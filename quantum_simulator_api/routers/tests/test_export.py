@@ -0,0 +1,41 @@
+import io
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from ...main import app
+
+client = TestClient(app)
+
+
+def test_export_channel(use_test_db, create_channel_with_state):
+    channel_id = create_channel_with_state["channel_id"]
+    state_id = create_channel_with_state["state_id"]
+    response = client.get(f"/channel/{channel_id}/export")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["type"] == "channel"
+    assert lines[0]["id"] == channel_id
+    assert lines[1]["type"] == "state"
+    assert lines[1]["id"] == state_id
+
+
+def test_export_channel_as_npz(use_test_db, create_channel_with_state):
+    channel_id = create_channel_with_state["channel_id"]
+    state_id = create_channel_with_state["state_id"]
+    response = client.get(f"/channel/{channel_id}/export?format=npz")
+    assert response.status_code == 200
+    archive = np.load(io.BytesIO(response.content))
+    qubits = archive[f"{channel_id}/qubits/{state_id}"]
+    assert np.allclose(qubits, [[1, 0], [0, 0]])
+
+
+def test_export_channels(use_test_db, create_channel_with_state):
+    channel_id = create_channel_with_state["channel_id"]
+    response = client.post("/export/", json={"channel_ids": [channel_id]})
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 2
+
+    response = client.post("/export/", json={"channel_ids": [channel_id, 0]})
+    assert response.status_code == 404
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+
+from ...main import app
+from .. import profile
+
+client = TestClient(app)
+
+
+def test_list_profile(use_test_db, create_profile, monkeypatch):
+    monkeypatch.setattr(profile, "PROFILE_TOKEN", "secret")
+    response = client.get("/profile/", headers={"X-Profile-Token": "secret"})
+    assert response.status_code == 200
+    assert create_profile in [item["id"] for item in response.json()["profiles"]]
+
+    response = client.get("/profile/", headers={"X-Profile-Token": "wrong"})
+    assert response.status_code == 403
+
+
+def test_get_profile(use_test_db, create_profile, monkeypatch):
+    monkeypatch.setattr(profile, "PROFILE_TOKEN", "secret")
+    headers = {"X-Profile-Token": "secret"}
+    response = client.get(f"/profile/{create_profile}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["summary"] == "test profile summary"
+
+    response = client.get("/profile/0", headers=headers)
+    assert response.status_code == 404
+
+
+def test_get_profile_without_configured_token(use_test_db, create_profile, monkeypatch):
+    monkeypatch.setattr(profile, "PROFILE_TOKEN", "")
+    response = client.get("/profile/")
+    assert response.status_code == 403
+
+    response = client.get(f"/profile/{create_profile}", headers={"X-Profile-Token": ""})
+    assert response.status_code == 403
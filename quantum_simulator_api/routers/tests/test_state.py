@@ -14,3 +14,36 @@ def test_list_state(use_test_db, create_state):
 def test_get_state(use_test_db, create_state):
     response = client.get(f"/state/{create_state}")
     assert response.status_code == 200
+
+
+def test_get_probabilities_of_state(use_test_db, create_state):
+    response = client.get(f"/state/{create_state}/probabilities?qubits=0")
+    assert response.status_code == 200
+    assert response.json()["probabilities"] == [1, 0]
+
+    response = client.get(f"/state/{create_state}/probabilities?qubits=1")
+    assert response.status_code == 400
+
+
+def test_get_expectation_of_state(use_test_db, create_state, create_observable):
+    response = client.get(
+        f"/state/{create_state}/expectation?transformer_id={create_observable}"
+    )
+    assert response.status_code == 200
+    assert response.json()["expectation"] == 1
+
+
+def test_get_reduced_state(use_test_db, create_state):
+    response = client.get(f"/state/{create_state}/reduced?keep=0")
+    assert response.status_code == 200
+    assert response.json()["keep"] == [0]
+    assert len(response.json()["qubits"]) == 2
+
+
+def test_get_state_with_etag(use_test_db, create_state):
+    response = client.get(f"/state/{create_state}")
+    etag = response.headers["etag"]
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(f"/state/{create_state}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
@@ -0,0 +1,98 @@
+from math import pi
+
+from fastapi.testclient import TestClient
+
+from ...main import app
+from .. import sweep
+
+client = TestClient(app)
+
+
+def test_sweep(use_test_db):
+    body = {
+        "qubit_count": 1,
+        "steps": [{"template": [["cos(t/2)", "-sin(t/2)"], ["sin(t/2)", "cos(t/2)"]]}],
+        "parameters": {"t": [0, pi]},
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 200
+    assert response.json()["parameters"]["t"] == [0, pi]
+    probabilities = response.json()["probabilities"]
+    assert round(probabilities[0][0], 6) == 1
+    assert round(probabilities[1][1], 6) == 1
+
+
+def test_sweep_with_observable(use_test_db, create_observable):
+    body = {
+        "qubit_count": 1,
+        "steps": [{"template": [["cos(t/2)", "-sin(t/2)"], ["sin(t/2)", "cos(t/2)"]]}],
+        "parameters": {"t": [0, pi / 2, pi]},
+        "observable_id": create_observable,
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 200
+    expectations = [round(value, 6) for value in response.json()["expectations"]]
+    assert expectations == [1, 0, -1]
+
+
+def test_sweep_with_invalid_template(use_test_db):
+    body = {
+        "qubit_count": 1,
+        "steps": [{"template": [["t", "0"], ["0", "1"]]}],
+        "parameters": {"t": [0, 2]},
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 400
+
+
+def test_sweep_with_kraus_transformer(use_test_db, create_kraus_transformer):
+    body = {
+        "qubit_count": 1,
+        "steps": [{"transformer_id": create_kraus_transformer}],
+        "parameters": {},
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 200
+    probabilities = [round(value, 6) for value in response.json()["probabilities"][0]]
+    assert probabilities == [0.7, 0.3]
+
+    body["trajectory_count"] = 4000
+    body["seed"] = 0
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 200
+    assert abs(response.json()["probabilities"][0][1] - 0.3) < 0.05
+
+
+def test_sweep_with_empty_parameter(use_test_db):
+    body = {
+        "qubit_count": 1,
+        "steps": [{"template": [["cos(t/2)", "-sin(t/2)"], ["sin(t/2)", "cos(t/2)"]]}],
+        "parameters": {"t": []},
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 400
+
+
+def test_sweep_with_too_many_points(use_test_db, monkeypatch):
+    monkeypatch.setattr(sweep, "SWEEP_MAX_POINTS", 3)
+    body = {
+        "qubit_count": 1,
+        "steps": [{"template": [["cos(t/2)", "-sin(t/2)"], ["sin(t/2)", "cos(t/2)"]]}],
+        "parameters": {"t": [0, pi], "s": [0, pi]},
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 400
+
+
+def test_sweep_with_too_many_trajectories(
+    use_test_db, create_kraus_transformer, monkeypatch
+):
+    monkeypatch.setattr(sweep, "SWEEP_MAX_TRAJECTORIES", 100)
+    body = {
+        "qubit_count": 1,
+        "steps": [{"transformer_id": create_kraus_transformer}],
+        "parameters": {},
+        "trajectory_count": 101,
+    }
+    response = client.post("/sweep/", json=body)
+    assert response.status_code == 400
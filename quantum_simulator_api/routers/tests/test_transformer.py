@@ -5,7 +5,7 @@ from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
 from ...main import app
-from ...models.models import Transformer
+from ...models.models import Transformer, TransformerType
 from ..transformer import check_channel_dependency
 
 client = TestClient(app)
@@ -24,6 +24,16 @@ def test_get_transformer(use_test_db, create_transformer):
     assert response.status_code == 200
 
 
+def test_get_transformer_with_etag(use_test_db, create_transformer):
+    response = client.get(f"/transformer/{create_transformer}")
+    etag = response.headers["etag"]
+
+    response = client.get(
+        f"/transformer/{create_transformer}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+
 def test_create_transformer(use_test_db, transformer_params):
     event_loop = asyncio.get_event_loop()
     response = client.post("/transformer/", json=transformer_params)
@@ -38,6 +48,23 @@ def test_create_transformer(use_test_db, transformer_params):
     assert transformer.matrix == comparison_matrix
 
 
+def test_create_kraus_transformer(use_test_db):
+    body = {
+        "type": TransformerType.KRAUS,
+        "name": "test amplitude damping transformer",
+        "operators": [
+            [["1", "0"], ["0", "sqrt(0.9)"]],
+            [["0", "sqrt(0.1)"], ["0", "0"]],
+        ],
+    }
+    response = client.post("/transformer/", json=body)
+    assert response.status_code == 200
+
+    body["operators"] = body["operators"][:1]
+    response = client.post("/transformer/", json=body)
+    assert response.status_code == 400
+
+
 def test_delete_transformer(use_test_db, create_transformer):
     response = client.delete(f"/transformer/{create_transformer}")
     assert response.status_code == 200
@@ -1,11 +1,19 @@
 import logging
 from typing import Dict, List
 
-from fastapi import APIRouter, HTTPException
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Response
 
-from ..models.models import Channel, Transformer
+from ..models.models import Channel, Transformer, TransformerType
 from ..serializers.serializers import TransformerSerializer
-from ..utils.utils import remove_spaces, translate_imaginary_string
+from ..utils.utils import (
+    CACHE_CONTROL,
+    compute_etag,
+    evaluate_matrix,
+    match_etag,
+    remove_spaces,
+    translate_imaginary_string,
+)
 
 logger = logging.getLogger("uvicorn")
 
@@ -29,11 +37,17 @@ async def list_transformer():
 
 
 @router.get("/{id}", response_model=dict)
-async def get_transformer(id: int):
+async def get_transformer(id: int, request: Request, response: Response):
     transformer = await Transformer.get(id=id)
     if not transformer:
         logger.exception(f"transformer with id={id} is not found")
         raise HTTPException(status_code=404, detail="not found")
+
+    # transformers are immutable once saved, so clients can cache them forever
+    headers = {"ETag": compute_etag(transformer.dict()), "Cache-Control": CACHE_CONTROL}
+    if match_etag(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     return transformer
 
 
@@ -43,10 +57,17 @@ async def create_transformer(serializer: TransformerSerializer):
     matrix_removed_spaces = remove_spaces(serializer.__dict__["matrix"])
     translated_matrix = translate_imaginary_string(matrix_removed_spaces)
     serializer.__dict__["matrix"] = translated_matrix
+    operators_removed_spaces = [
+        remove_spaces(operator) for operator in serializer.__dict__["operators"]
+    ]
+    serializer.__dict__["operators"] = [
+        translate_imaginary_string(operator) for operator in operators_removed_spaces
+    ]
     serializer.validate_matrix()
 
     # set matrix removed spaces
     serializer.__dict__["matrix"] = matrix_removed_spaces
+    serializer.__dict__["operators"] = operators_removed_spaces
 
     # set target qubit count
     serializer.__dict__["target_qubit_count"] = serializer.get_target_qubit_count()
@@ -67,12 +88,46 @@ async def delete_transformer(id: int):
 
 
 async def check_channel_dependency(transformer_id: int) -> None:
-    for channel in await Channel.list():
-        if (
-            transformer_id in channel["init_transformer_ids"]
-            or transformer_id in channel["transformer_ids"]
-        ):
-            raise HTTPException(
-                status_code=400,
-                detail=f"this transformer is used by channel id {channel['id']}",
-            )
+    channels = await Channel.list(
+        _limit=1,
+        **{
+            "$or": [
+                {"init_transformer_ids": transformer_id},
+                {"transformer_ids": transformer_id},
+            ]
+        },
+    )
+    if channels:
+        raise HTTPException(
+            status_code=400,
+            detail=f"this transformer is used by channel id {channels[0]['id']}",
+        )
+
+
+async def load_transformer(transformer_id: int) -> Transformer:
+    transformer = await Transformer.get(id=transformer_id)
+    if not transformer:
+        message = f"transformer with id '{transformer_id}' is not found"
+        logger.exception(message)
+        raise HTTPException(status_code=404, detail=message)
+    return transformer
+
+
+async def load_matrix(
+    transformer_id: int, transformer_type: TransformerType
+) -> np.ndarray:
+    transformer = await load_transformer(transformer_id)
+    if transformer.type != transformer_type:
+        raise HTTPException(
+            status_code=400,
+            detail=f"transformer with id '{transformer_id}' "
+            f"is not {transformer_type.name.lower()} transformer",
+        )
+    return np.array(evaluate_matrix(transformer.matrix), dtype=np.complex128)
+
+
+def load_operators(transformer: Transformer) -> np.ndarray:
+    return np.array(
+        [evaluate_matrix(operator) for operator in transformer.operators],
+        dtype=np.complex128,
+    )
@@ -31,7 +31,40 @@ def valid_transformer(request):
             "type": TransformerType.TIMEEVOLVE,
             "matrix": [["1", "0"], ["0", "0"]],
         },
+        {"type": TransformerType.OBSERVE, "matrix": []},
+        {"type": TransformerType.TIMEEVOLVE, "matrix": []},
+        {
+            "type": TransformerType.TIMEEVOLVE,
+            "matrix": [["0", "1"], ["1", "0"]],
+            "operators": [[["0", "1"], ["1", "0"]]],
+        },
     ],
 )
 def invalid_transformer(request):
     return request.param
+
+
+@pytest.fixture(
+    scope="function",
+    params=[
+        [[["1", "0"], ["0", "sqrt(0.9)"]], [["0", "sqrt(0.1)"], ["0", "0"]]],
+        [
+            [["sqrt(1/2)", "0"], ["0", "sqrt(1/2)"]],
+            [["0", "-sqrt(1/2)*1j"], ["sqrt(1/2)*1j", "0"]],
+        ],
+    ],
+)
+def valid_operators(request):
+    return request.param
+
+
+@pytest.fixture(
+    scope="function",
+    params=[
+        [[["1", "0"], ["0", "1"]], [["0", "1"], ["1", "0"]]],
+        [[["1", "0", "0"], ["0", "1", "0"], ["0", "0", "1"]]],
+        [[["1ERROR", "0"], ["0", "1"]]],
+    ],
+)
+def invalid_operators(request):
+    return request.param
@@ -1,14 +1,19 @@
 import logging
+from enum import Enum
 from math import sqrt  # noqa
+from typing import Dict, List, Optional
 
+import numpy as np
 from fastapi import HTTPException
 from fastapi_contrib.serializers import openapi
 from fastapi_contrib.serializers.common import ModelSerializer
+from pydantic import BaseModel, Field
 from quantum_simulator.base.observable import Observable
 from quantum_simulator.base.time_evolution import TimeEvolution
 from quantum_simulator.base.utils import count_bits
 
-from ..models.models import Transformer, TransformerType
+from ..kernels.kernels import is_complete
+from ..models.models import Precision, Transformer, TransformerType
 
 logger = logging.getLogger("uvicorn")
 
@@ -19,6 +24,20 @@ class TransformerSerializer(ModelSerializer):
     target_qubit_count: int
 
     def validate_matrix(self):
+        if self.type == TransformerType.KRAUS:
+            if self.matrix:
+                raise HTTPException(
+                    status_code=400, detail="kraus transformer does not take matrix"
+                )
+            self.validate_operators()
+            return
+
+        if not self.matrix:
+            raise HTTPException(status_code=400, detail="matrix is required")
+        if self.operators:
+            raise HTTPException(
+                status_code=400, detail="only kraus transformer takes operators"
+            )
         try:
             matrix = [list(map(lambda s: complex(eval(s)), row)) for row in self.matrix]
         except Exception as e:
@@ -44,9 +63,66 @@ class TransformerSerializer(ModelSerializer):
                     status_code=400, detail="given matrix is not time evolution"
                 )
 
+    def validate_operators(self):
+        try:
+            operators = np.array(
+                [
+                    [list(map(lambda s: complex(eval(s)), row)) for row in operator]
+                    for operator in self.operators
+                ]
+            )
+        except Exception as e:
+            logger.exception(e)
+            raise HTTPException(
+                status_code=400,
+                detail="given operators cannot convert to complex matrices",
+            )
+
+        if (
+            operators.ndim != 3
+            or operators.shape[1] != operators.shape[2]
+            or operators.shape[1] < 2
+            or 2 ** (count_bits(operators.shape[1]) - 1) != operators.shape[1]
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="given operators are not square matrices of qubits size",
+            )
+        if not is_complete(operators):
+            raise HTTPException(
+                status_code=400, detail="given operators are not complete"
+            )
+
     def get_target_qubit_count(self) -> int:
+        if self.type == TransformerType.KRAUS:
+            return count_bits(len(self.operators[0])) - 1
         return count_bits(len(self.matrix)) - 1
 
     class Meta:
         model = Transformer
         read_only_fields = {"id", "target_qubit_count"}
+
+
+class SweepStepSerializer(BaseModel):
+    transformer_id: Optional[int] = None
+    template: Optional[List[List[str]]] = None
+
+
+class SweepSerializer(BaseModel):
+    qubit_count: int = Field(1, ge=1, le=8)
+    steps: List[SweepStepSerializer]
+    parameters: Dict[str, List[float]]
+    observable_id: Optional[int] = None
+    trajectory_count: Optional[int] = Field(None, ge=1)
+    seed: Optional[int] = None
+    precision: Precision = Precision.COMPLEX128
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    NPZ = "npz"
+
+
+class ExportSerializer(BaseModel):
+    channel_ids: List[int]
+    format: ExportFormat = ExportFormat.NDJSON
@@ -1,5 +1,6 @@
 import pytest
 
+from ...models.models import TransformerType
 from ..serializers import TransformerSerializer
 
 
@@ -14,8 +15,35 @@ def test_validate_matrix(valid_transformer):
 
 
 def test_invalidate_matrix(invalid_transformer):
+    serializer = TransformerSerializer(**invalid_transformer)
+    with pytest.raises(Exception):
+        serializer.validate_matrix()
+
+
+def test_validate_operators(valid_operators):
+    serializer = TransformerSerializer(
+        type=TransformerType.KRAUS, operators=valid_operators
+    )
+    try:
+        serializer.validate_matrix()
+    except Exception:
+        pytest.fail("valid operators are dealed with invalid")
+    assert serializer.get_target_qubit_count() == 1
+
+
+def test_invalidate_operators(invalid_operators):
+    serializer = TransformerSerializer(
+        type=TransformerType.KRAUS, operators=invalid_operators
+    )
+    with pytest.raises(Exception):
+        serializer.validate_matrix()
+
+
+def test_invalidate_operators_with_matrix(valid_operators):
     serializer = TransformerSerializer(
-        type=invalid_transformer["type"], matrix=invalid_transformer["matrix"]
+        type=TransformerType.KRAUS,
+        matrix=[["1", "0"], ["0", "1"]],
+        operators=valid_operators,
     )
     with pytest.raises(Exception):
         serializer.validate_matrix()
@@ -1,4 +1,7 @@
 from ..utils import (
+    compute_etag,
+    match_etag,
+    parse_diagonal,
     remove_spaces,
     translate_imaginary_string,
     translate_imaginary_symbol,
@@ -22,3 +25,22 @@ def test_translate_imaginary_symbol(matrix_includes_imaginary_symbol):
     result_matrix = translate_imaginary_symbol(matrix_includes_imaginary_symbol)
     for element in result_matrix:
         assert "i" in element
+
+
+def test_compute_etag():
+    etag = compute_etag({"qubits": [["1", "0"], ["0", "0"]], "registers": [0]})
+    assert etag == compute_etag({"registers": [0], "qubits": [["1", "0"], ["0", "0"]]})
+    assert etag != compute_etag({"qubits": [["0", "0"], ["0", "1"]], "registers": [0]})
+
+
+def test_match_etag():
+    assert match_etag('"a", "b"', '"b"')
+    assert match_etag('W/"b"', '"b"')
+    assert match_etag("*", '"b"')
+    assert not match_etag('"a"', '"b"')
+    assert not match_etag(None, '"b"')
+
+
+def test_parse_diagonal():
+    matrix = [["(0.5+0i)", "(0.5-0.1i)"], ["(0.5+0.1i)", "(0.5+0i)"]]
+    assert parse_diagonal(matrix) == [0.5, 0.5]
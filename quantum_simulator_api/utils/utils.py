@@ -1,4 +1,10 @@
-from typing import List
+import hashlib
+import json
+from math import sqrt  # noqa
+from typing import List, Optional
+
+# states and transformers are immutable once saved, so they can be cached forever
+CACHE_CONTROL = "public, max-age=31536000, immutable"
 
 
 def remove_spaces(matrix: List[List[str]]) -> List[List[str]]:
@@ -14,3 +20,33 @@ def translate_imaginary_string(matrix: List[List[str]]) -> List[List[str]]:
 
 def translate_imaginary_symbol(matrix: List[List[str]]) -> List[List[str]]:
     return [list(map(lambda s: s.replace("j", "i"), row)) for row in matrix]
+
+
+def evaluate_matrix(matrix: List[List[str]]) -> List[List[complex]]:
+    sanitized_matrix = translate_imaginary_string(remove_spaces(matrix))
+    return [list(map(lambda s: complex(eval(s)), row)) for row in sanitized_matrix]
+
+
+def parse_matrix(matrix: List[List[str]]) -> List[List[complex]]:
+    return [list(map(complex, row)) for row in translate_imaginary_string(matrix)]
+
+
+def parse_diagonal(matrix: List[List[str]]) -> List[float]:
+    # real part of density matrix diagonal without parsing off-diagonal elements
+    return [
+        complex(row[index].replace("i", "j")).real for index, row in enumerate(matrix)
+    ]
+
+
+def compute_etag(document: dict) -> str:
+    content = json.dumps(document, sort_keys=True, default=str).encode()
+    return f'"{hashlib.sha256(content).hexdigest()}"'
+
+
+def match_etag(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate.replace("W/", "", 1) == etag for candidate in candidates
+    )